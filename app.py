@@ -1,14 +1,48 @@
 import re
+import numpy as np
 import pandas as pd
 import os
 import logging
-from flask import Flask, request, send_file, render_template, jsonify, session
-from openpyxl import load_workbook
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
+from flask import Flask, Response, request, send_file, render_template, jsonify, session, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+from werkzeug.datastructures import FileStorage
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
 from werkzeug.utils import secure_filename
+import codecs
+import cProfile
+import fcntl
+import gzip
+import hashlib
+import hmac
+import importlib.util
+import io
+import json
+import mmap
+import multiprocessing
+import operator
+import pstats
 import shutil
+import sqlite3
+import tarfile
+import threading
+import time
 import uuid
+import zipfile
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime
+from functools import lru_cache
+
+try:
+    import brotli  # Optional: adds .br variants of the UI assets
+except ImportError:
+    brotli = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,10 +52,57 @@ app = Flask(__name__)
 app.secret_key = 'your-secret-key-here-change-in-production'  # Change this in production
 
 # Configuration
-UPLOAD_FOLDER = 'uploads'
+UPLOAD_FOLDER = os.environ.get('REKON_UPLOAD_FOLDER', 'uploads')  # Blob store root; share it between hosts
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 ALLOWED_EXTENSIONS = {'txt'}
 MAX_FILES = 50
+PARSE_WORKERS = os.cpu_count() or 1  # Parser processes used by process_files
+PARALLEL_MIN_FILES = 8  # Smaller batches are parsed serially
+JOB_WORKERS = 2  # Threads per process that claim and run queued /process jobs
+JOB_POLL_SECONDS = 2  # How often idle job threads look for jobs queued by other processes
+PARSE_ON_UPLOAD = False  # Parse files during /upload instead of saving them for /process
+RETAIN_UPLOADS = False  # With PARSE_ON_UPLOAD, also keep the raw TXT files
+PARSED_ROWS_FILE = 'parsed_rows.json'
+SEEN_FILES_FILE = 'seen_files.json'  # Rows of TXT files already parsed by /process, by name and hash
+KEEP_SESSIONS = True  # Keep the upload folder after /download so late files can be added to it
+STATE_DB = os.environ.get('REKON_STATE_DB', os.path.join('state', 'rekon_state.sqlite3'))  # Jobs and chunked uploads
+JOB_STALE_SECONDS = 600  # A running job with no heartbeat for this long is reported as interrupted
+JOB_HEARTBEAT_SECONDS = 30  # How often a running job touches its record; queued jobs never go stale
+STATE_RETENTION_SECONDS = 7 * 24 * 3600  # Job and upload records untouched for this long are pruned
+MAX_ACTIVE_JOBS = 8  # Jobs queued or running across all workers; /process answers 429 beyond this
+MAX_JOBS_PER_CLIENT = 1  # Jobs one browser session may have queued or running
+JOB_DURATION_WINDOW = 3600  # Jobs finished this recently feed the Retry-After estimate
+HISTORY_DB = os.environ.get('REKON_HISTORY_DB', os.path.join('state', 'rekon_history.sqlite3'))  # None disables
+HISTORY_MAX_ROWS = 10000  # Most rows one /history/rows call returns
+HISTORY_CHUNK_ROWS = 500  # Parsed rows buffered per history_store write
+PARSE_CACHE_SIZE = int(os.environ.get('REKON_PARSE_CACHE_SIZE', 1024))  # Parse results kept in memory per process
+PARSE_CACHE_DB = os.environ.get('REKON_PARSE_CACHE_DB', os.path.join('cache', 'parse_cache.sqlite3')) or None  # None ('') disables the disk tier
+PARSE_CACHE_DB_MAX_BYTES = 256 * 1024 * 1024  # Disk tier is trimmed oldest-first above this
+EXPORT_CHUNK_ROWS = 10000  # Rows per chunk when streaming CSV exports
+SUMMARY_SHEETS = True  # Add per-SOFCODE, per-category and grand total sheets to Excel exports
+VALIDATION_AMOUNT_TOLERANCE = 0  # Rupiah Dana Pembayaran may differ from the category total
+VALIDATION_RELATIVE_TOLERANCE = 0.0  # ... or this fraction of Dana Pembayaran, whichever is larger
+VALIDATION_DANA_EXCLUDES = []  # Categories not counted towards Dana Pembayaran
+VALIDATION_FILE = 'validation.json'  # Issues of the last run, in the upload folder
+ADMIN_TOKEN = os.environ.get('REKON_ADMIN_TOKEN')  # X-Admin-Token for /admin endpoints; unset disables them
+PROFILE_ALL_JOBS = False  # Profile every /process job, not only those sent with X-Rekon-Profile
+PROFILE_FOLDER = 'profiles'
+PROFILE_KEEP = 20  # Newest profiles kept in PROFILE_FOLDER
+ARCHIVE_EXTENSIONS = ('.zip', '.tar.gz', '.tgz')  # Parsed member by member; never extracted to disk
+MAX_ARCHIVE_MEMBERS = 5000  # Entries of any kind per archive
+MAX_ARCHIVE_BYTES = 1024 * 1024 * 1024  # Uncompressed bytes per archive
+MAX_ARCHIVE_RATIO = 200  # Largest uncompressed/compressed ratio accepted for a ZIP member
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # Chunk size suggested to /uploads clients
+UPLOAD_CHUNK_MAX = 16 * 1024 * 1024  # Largest chunk accepted by PUT /uploads/<id>
+CHUNKS_DIR = '.chunks'  # Partial chunked uploads, inside the upload folder
+API_ARCHIVE_MAX_BYTES = 128 * 1024 * 1024  # Largest archive /api/v1/parse holds in memory (compressed)
+UPLOAD_TTL_SECONDS = 24 * 3600  # Batches untouched for this long are deleted by the janitor; 0 keeps them
+UPLOAD_QUOTA_BYTES = 20 * 1024 * 1024 * 1024  # Above this the janitor evicts batches oldest first; 0 for no quota
+UPLOAD_GRACE_SECONDS = 600  # Batches touched more recently are never evicted for the quota
+JANITOR_INTERVAL = 300  # Seconds between janitor passes; 0 disables the janitor
+ASSET_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')  # UI page, CSS and JS sources
+ASSET_MAX_AGE = 365 * 24 * 3600  # Cache lifetime of the content-hashed /assets/ files
+METRICS_DIR = os.environ.get('REKON_METRICS_DIR', os.path.join('state', 'metrics')) or None  # Per-process metric files; '' keeps them in memory
 
 # Define column template with improved structure
 COLUMNS = [
@@ -39,6 +120,252 @@ COLUMNS = [
     "Penghapusan denda konsumen Jumlah", "Penghapusan denda konsumen Acc",
 ]
 
+# --- Metrics ---------------------------------------------------------------------
+# Minimal Prometheus-style registry served at /metrics.  Every process (each
+# gunicorn worker, each parse worker) writes its values to its own mmap'd file
+# in METRICS_DIR and /metrics sums the files, so the numbers cover the whole
+# host however the processes were started -- no --preload needed.  Files of
+# exited processes are kept, so counters never go backwards; empty the
+# directory when deploying if that history is not wanted.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = []
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MetricFiles:
+    """Slots of float64 metric values, one file of them per process.
+
+    A process only writes its own file (created on first use, and again
+    after a fork), so no lock spans processes.  Files are named after the
+    metric layout, so files written by another version are ignored.  Files
+    of processes that have exited are folded into one `<layout>_dead.db`
+    on read, so their number stays bounded by the live processes.  With
+    `directory` None the values stay in this process's memory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.size = 0
+        self._resets = []  # Slots that restart at zero when a pid is reused (gauges)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._values = None
+
+    def allocate(self, width, reset=False):
+        """Reserve `width` slots and return the first one."""
+        offset, self.size = self.size, self.size + width
+        if reset:
+            self._resets.extend(range(offset, self.size))
+        return offset
+
+    def _layout(self):
+        return hashlib.sha256(repr([(m.name, m.kind) for m in METRICS]).encode()).hexdigest()[:12]
+
+    def _open(self):
+        if self._pid == os.getpid():
+            return self._values
+        if self.directory is None:
+            values = memoryview(bytearray(self.size * 8)).cast('d')
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{self._layout()}_{os.getpid()}.db")
+            with open(path, 'a+b') as f:
+                f.truncate(self.size * 8)
+                values = memoryview(mmap.mmap(f.fileno(), self.size * 8)).cast('d')
+            for i in self._resets:
+                values[i] = 0.0
+        self._values, self._pid = values, os.getpid()
+        return values
+
+    def add(self, offset, amount):
+        with self._lock:
+            self._open()[offset] += amount
+
+    def set(self, offset, value):
+        with self._lock:
+            self._open()[offset] = value
+
+    def read(self):
+        """[(process alive, values)] for every process that wrote metrics."""
+        if self.directory is None:
+            with self._lock:
+                return [(True, list(self._open()))]
+        prefix = self._layout() + '_'
+        files, dead = [], []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else ():
+            if not (name.startswith(prefix) and name.endswith('.db')) or name == prefix + 'dead.db':
+                continue
+            if not _pid_alive(int(name[len(prefix):-3])):
+                dead.append(name)
+                continue
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                data = f.read()
+            if len(data) == self.size * 8:
+                files.append((True, memoryview(data).cast('d')))
+        if dead or os.path.exists(os.path.join(self.directory, prefix + 'dead.db')):
+            files.append((False, self._fold(prefix, dead)))
+        return files
+
+    def _fold(self, prefix, names):
+        """Add the files `names` of exited processes to the dead totals, then remove them.
+
+        The totals file is locked while folding, so concurrent readers fold
+        each file once.  Gauge slots are not carried over.
+        """
+        fd = os.open(os.path.join(self.directory, prefix + 'dead.db'), os.O_RDWR | os.O_CREAT, 0o644)
+        with open(fd, 'r+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            data = f.read()
+            totals = memoryview(bytearray(data if len(data) == self.size * 8 else self.size * 8)).cast('d')
+            resets, folded = set(self._resets), []
+            for name in names:
+                try:
+                    with open(os.path.join(self.directory, name), 'rb') as g:
+                        data = g.read()
+                except FileNotFoundError:
+                    continue  # Folded by another reader
+                if len(data) == self.size * 8:
+                    for i, value in enumerate(memoryview(data).cast('d')):
+                        if i not in resets:
+                            totals[i] += value
+                folded.append(name)
+            if folded:
+                f.seek(0)
+                f.write(totals.cast('B'))
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+                for name in folded:
+                    os.remove(os.path.join(self.directory, name))
+        return totals
+
+metric_files = MetricFiles(METRICS_DIR)
+
+def keep_metrics_local():
+    """Keep this process's metrics, and its parse workers', out of METRICS_DIR.
+
+    For tools run next to a deployment (CLI, benchmark), whose numbers
+    must not show up in the app's /metrics.  Call before any metric is used.
+    """
+    metric_files.directory = None
+    os.environ['REKON_METRICS_DIR'] = ''
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self._offset = metric_files.allocate(1, reset=self.kind == 'gauge')
+        METRICS.append(self)
+
+    def inc(self, amount=1):
+        metric_files.add(self._offset, amount)
+
+    def value(self, files=None):
+        files = metric_files.read() if files is None else files
+        return sum(values[self._offset] for _, values in files)
+
+    def samples(self, files):
+        return [(self.name, '', self.value(files))]
+
+class Gauge(Counter):
+    """Gauge over the live processes: their sum, or with mode='max' the largest."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, mode='sum'):
+        super().__init__(name, help_text)
+        self.mode = mode
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        metric_files.set(self._offset, value)
+
+    def value(self, files=None):
+        files = metric_files.read() if files is None else files
+        live = [values[self._offset] for alive, values in files if alive]
+        return (max if self.mode == 'max' else sum)(live) if live else 0
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help_text, buckets
+        # one slot per bucket, then +Inf, then the sum
+        self._offset = metric_files.allocate(len(buckets) + 2)
+        METRICS.append(self)
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        metric_files.add(self._offset + i, 1)
+        metric_files.add(self._offset + len(self.buckets) + 1, value)
+
+    def samples(self, files):
+        width = len(self.buckets) + 2
+        values = [sum(v[self._offset + i] for _, v in files) for i in range(width)]
+        samples, total = [], 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], values[:-1]):
+            total += count
+            samples.append((f"{self.name}_bucket", f'le="{bound}"', total))
+        samples.append((f"{self.name}_sum", '', values[-1]))
+        samples.append((f"{self.name}_count", '', total))
+        return samples
+
+@contextmanager
+def timed_stage(histogram):
+    """Observe the wall time of a block (or, as a decorator, of a call)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+UPLOAD_SECONDS = Histogram('rekon_upload_seconds', 'Time spent handling /upload')
+DECODE_SECONDS = Histogram('rekon_decode_seconds', 'Time spent in extract_text_from_file')
+PARSE_SECONDS = Histogram('rekon_parse_seconds', 'Time spent in parse_jf_text per file')
+DATAFRAME_SECONDS = Histogram('rekon_dataframe_build_seconds', 'Time spent building the batch DataFrame')
+EXPORT_SECONDS = Histogram('rekon_export_seconds', 'Time spent writing the output file (Excel or other format)')
+DOWNLOAD_SECONDS = Histogram('rekon_download_seconds', 'Time spent handling /download')
+FILES_PROCESSED = Counter('rekon_files_processed_total', 'Files turned into rows')
+FILES_ERRORED = Counter('rekon_files_errored_total', 'Files that failed to read or parse')
+BYTES_INGESTED = Counter('rekon_bytes_ingested_total', 'Bytes of TXT accepted by /upload')
+JOBS_IN_FLIGHT = Gauge('rekon_jobs_in_flight', 'Processing jobs running')
+UPLOAD_BYTES = Gauge('rekon_upload_bytes', 'Bytes in upload batches at the last janitor pass', mode='max')
+BATCHES_SWEPT = Counter('rekon_janitor_batches_removed_total', 'Upload batches deleted by the janitor')
+BYTES_RECLAIMED = Counter('rekon_janitor_reclaimed_bytes_total', 'Bytes freed by the janitor')
+CACHE_MEMORY_HITS = Counter('rekon_parse_cache_memory_hits_total', 'Parse cache hits served from memory')
+CACHE_DISK_HITS = Counter('rekon_parse_cache_disk_hits_total', 'Parse cache hits served from SQLite')
+CACHE_MISSES = Counter('rekon_parse_cache_misses_total', 'Parse cache misses')
+
+def _format_sample(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def render_metrics(extra=()):
+    """Prometheus text exposition of METRICS plus `extra` (name, kind, help, value)."""
+    lines = []
+    files = metric_files.read()
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples(files):
+            sample = f"{name}{{{labels}}}" if labels else name
+            lines.append(f"{sample} {_format_sample(value)}")
+    for name, kind, help_text, value in extra:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_format_sample(value)}"]
+    return "\n".join(lines) + "\n"
+
 def extract_code_from_filename(filename: str) -> str:
     """Extract BANK JF/SOFCODE from the uploaded filename.
 
@@ -101,6 +428,26 @@ def extract_code_from_filename(filename: str) -> str:
         logger.error(f"Error extracting code from filename {filename}: {str(e)}")
         return ""
 
+_DATE_DDMMYYYY_RE = re.compile(r"(?<!\d)(\d{2})(\d{2})(\d{4})(?!\d)")
+_DATE_YYMMDD_RE = re.compile(r"(?<!\d)(\d{2})(\d{2})(\d{2})(?!\d)")
+
+def extract_date_from_filename(filename: str):
+    """Statement date from the filename as 'YYYY-MM-DD', or None.
+
+    * 'SOFCODE-1_FIFIP_PKKF01072025.txt' -> DDMMYYYY
+    * 'JFCS2COVI-1_FIFJIN_250701.txt'    -> YYMMDD
+    """
+    base = os.path.splitext(os.path.basename(filename))[0]
+    rest = base.split("_", 1)[1] if "_" in base else base  # skip the SOFCODE part
+    for pattern, order in ((_DATE_DDMMYYYY_RE, (2, 1, 0)), (_DATE_YYMMDD_RE, (0, 1, 2))):
+        for m in pattern.finditer(rest):
+            year, month, day = (int(m.group(i + 1)) for i in order)
+            try:
+                return datetime(year if year > 99 else 2000 + year, month, day).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+    return None
+
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -112,22 +459,187 @@ def validate_file_size(file):
     file.seek(0)
     return size <= MAX_FILE_SIZE
 
-def extract_text_from_file(file_bytes: bytes) -> str:
-    """Decode TXT bytes and strip non-printable characters with better error handling."""
+def read_upload(file):
+    """Read an uploaded file in one bounded pass; None if it exceeds MAX_FILE_SIZE."""
+    raw = file.stream.read(MAX_FILE_SIZE + 1)
+    return raw if len(raw) <= MAX_FILE_SIZE else None
+
+# --- Archive uploads -------------------------------------------------------------
+# Banks send a day's letters as one ZIP or tar.gz.  Members are read straight
+# from the request stream into the parser; limits apply to what is actually
+# decompressed, not to the sizes the archive claims.
+
+class ArchiveError(ValueError):
+    """The archive is unreadable or exceeds one of the MAX_ARCHIVE_* limits."""
+
+def is_archive(filename):
+    """Check if the upload is an archive of TXT files."""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def _zip_members(fileobj, charge):
+    with zipfile.ZipFile(fileobj) as archive:
+        infos = archive.infolist()
+        if len(infos) > MAX_ARCHIVE_MEMBERS:
+            raise ArchiveError(f"more than {MAX_ARCHIVE_MEMBERS} members")
+        for info in infos:
+            if info.is_dir():
+                continue
+            if not allowed_file(info.filename):
+                yield info.filename, None
+                continue
+            # The header sizes can lie, so the limits are checked on the bytes read
+            with archive.open(info) as stream:
+                raw = stream.read(MAX_FILE_SIZE + 1)
+            charge(len(raw))
+            if len(raw) > MAX_ARCHIVE_RATIO * max(info.compress_size, 1):
+                raise ArchiveError(f"{info.filename} expands more than {MAX_ARCHIVE_RATIO}x")
+            yield info.filename, raw
+
+def _tar_members(fileobj, charge):
+    # 'r|gz' reads strictly forward; skipping a member still decompresses it,
+    # so every member's size counts towards the limit.
+    with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+        for count, info in enumerate(archive, 1):
+            if count > MAX_ARCHIVE_MEMBERS:
+                raise ArchiveError(f"more than {MAX_ARCHIVE_MEMBERS} members")
+            charge(info.size)
+            if not info.isfile():
+                continue
+            if not allowed_file(info.name):
+                yield info.name, None
+                continue
+            yield info.name, archive.extractfile(info).read(MAX_FILE_SIZE + 1)
+
+def iter_archive(file):
+    """Yield (member filename, raw bytes, problem) for each file in an uploaded archive.
+
+    raw is None when the member is skipped and problem says why.  Raises
+    ArchiveError once the member count or uncompressed total goes over the
+    MAX_ARCHIVE_* limits, or when a ZIP member expands suspiciously far.
+    """
+    remaining = MAX_ARCHIVE_BYTES
+
+    def charge(size):
+        nonlocal remaining
+        remaining -= size
+        if remaining < 0:
+            raise ArchiveError(f"more than {MAX_ARCHIVE_BYTES} bytes uncompressed")
+
+    members = _zip_members if file.filename.lower().endswith('.zip') else _tar_members
     try:
-        # Try UTF-8 first
-        text = file_bytes.decode('utf-8', errors='ignore')
-    except UnicodeDecodeError:
-        try:
-            # Fallback to latin-1
-            text = file_bytes.decode('latin-1', errors='ignore')
-        except UnicodeDecodeError:
-            # Last resort - CP1252 (Windows)
-            text = file_bytes.decode('cp1252', errors='ignore')
-    
-    # Clean non-printable characters but keep newlines and tabs
-    text = re.sub(r'[^\x20-\x7E\n\t]', '', text)
-    return text
+        for member, raw in members(file.stream, charge):
+            if raw is None:
+                yield os.path.basename(member), None, 'invalid type'
+            elif len(raw) > MAX_FILE_SIZE:
+                yield os.path.basename(member), None, 'too large'
+            else:
+                yield os.path.basename(member), raw, None
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"unreadable archive: {e}") from e
+
+# Bytes kept by the decode stage: printable ASCII plus newline and tab. Every
+# ASCII-compatible encoding (UTF-8, latin-1, cp1252) maps these bytes to the
+# same characters and everything else is dropped anyway, so the filter can run
+# on the raw bytes without guessing the codec first.
+_KEEP_BYTES = bytes(range(0x20, 0x7F)) + b'\n\t'
+_DROP_BYTES = bytes(b for b in range(256) if b not in _KEEP_BYTES)
+
+# The only encodings where byte-level filtering would keep the wrong bytes
+# (UTF-32 first: its little-endian BOM starts with the UTF-16 one).
+_BOM_ENCODINGS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def detect_wide_encoding(file_bytes: bytes):
+    """Return the UTF-16/32 codec named by a leading BOM, or None."""
+    for bom, encoding in _BOM_ENCODINGS:
+        if file_bytes.startswith(bom):
+            return encoding
+    return None
+
+
+def extract_text_from_file(file_bytes: bytes) -> str:
+    """Decode TXT bytes, keeping only printable ASCII, newlines and tabs."""
+    encoding = detect_wide_encoding(file_bytes)
+    if encoding:
+        file_bytes = file_bytes.decode(encoding, errors='ignore').encode('ascii', errors='ignore')
+    # One C-level pass over the bytes; the result is pure ASCII, so the decode
+    # is a straight copy into the str the parser scans.
+    return file_bytes.translate(None, _DROP_BYTES).decode('ascii')
+
+# --- Extraction rules ----------------------------------------------------------
+# Every pattern below is compiled once at import; `parse_jf_text` finds all of
+# them in a single scan of the decoded text (see `_keyword_hits`).
+
+SOFCODE_PATTERNS = [
+    re.compile(r"\(\s*([A-Z0-9]+)\s*\)", re.I),
+    re.compile(r"SOFCODE\s*[:\s]*([A-Z0-9]+)", re.I),
+    re.compile(r"Bank\s+[^\(]*\(\s*([A-Z0-9]+)\s*\)", re.I),
+]
+
+# "Dana Pembayaran" keywords, in priority order.
+DANA_KEYWORDS = [
+    r"sejumlah\s+Rp\.",
+    r"jumlah\s+Rp\.",
+    r"sebesar\s+Rp\.",
+]
+
+ANGSURAN_KEYWORD = r"a\)\s*Pembayaran\s+angsuran\s+sebesar\s+Rp\."
+
+# Remaining categories (b, c, d, ...): (column label, keyword pattern)
+CATEGORY_RULES = [
+    ("Pembayaran Denda",                       r"Pembayaran\s+denda"),
+    ("Pelunasan dipercepat",                   r"Pembayaran\s+pelunasan\s+dipercepat"),
+    ("Denda Pelunasan dipercepat",             r"Denda\s+pelunasan\s+dipercepat"),
+    ("Penalti Pelunasan dipercepat",           r"Pembayaran\s+penalti\s+pelunasan\s+dipercepat"),
+    ("Pelunasan dipercepat case Asuransi",     r"pelunasan\s+dipercepat\s+karena\s+pencairan\s+tagihan\s+asuransi"),
+    ("Penalti pelunasan dipercepat case Asuransi", r"penalti\s+pelunasan\s+dipercepat\s+karena\s+pencairan\s+tagihan\s+asuransi"),
+    ("Pembayaran Recovery",                    r"Pembayaran\s+recovery"),
+    ("Penghapusan denda konsumen",             r"Penghapusan\s+denda"),
+]
+
+_NON_DIGIT_RE = re.compile(r"[^\d]")
+_RP_RE = re.compile(r"Rp\.", re.I)
+_AMOUNT_RE = re.compile(r"\s*[^\d]*(?P<amt>[\d\.,]+)")                                # Rp. <amount>
+_COUNT_RE = re.compile(r".*?untuk\s+[^\d]*(?P<cnt>[\d\.,]+)[^\d]*\s+Konsumen", re.I | re.S)  # ... untuk <count> Konsumen
+
+# Lettered points "a)", "b)", ... split a letter into section windows.  Amounts
+# and counts are only read inside the window their keyword sits in, so a point
+# whose "untuk N Konsumen" is missing can neither borrow the next point's count
+# nor drag a lazy `.*?` through the rest of the file.  Category keywords in the
+# letter header (e.g. "Perihal : Pembayaran Denda ...") are not points and are
+# skipped; a hit whose window has no amount and count gives way to the next.
+_POINT_RE = re.compile(r"(?<!\S)[a-z]\)", re.I)
+
+# One alternation over every keyword.  The scan resumes one character after
+# each hit, so overlapping keywords ("Pembayaran penalti pelunasan ...") are
+# all reported; no two keywords can match at the same offset.  A lookahead on
+# the keywords' first two literal characters lets the engine skip most offsets.
+_KEYWORD_GROUPS = (
+    [(f"dana{i}", pat) for i, pat in enumerate(DANA_KEYWORDS)]
+    + [("angsuran", ANGSURAN_KEYWORD)]
+    + [(f"cat{i}", pat) for i, (_, pat) in enumerate(CATEGORY_RULES)]
+)
+_KEYWORD_PREFIXES = [re.sub(r"\\(.)", r"\1", pat)[:2].lower() for _, pat in _KEYWORD_GROUPS]
+_KEYWORD_SCAN_RE = re.compile(
+    "(?=[%s][%s])" % tuple(re.escape("".join(sorted({p[i] for p in _KEYWORD_PREFIXES}))) for i in (0, 1))
+    + "(?:" + "|".join(f"(?P<{name}>{pat})" for name, pat in _KEYWORD_GROUPS) + ")",
+    re.I,
+)
+
+# Bump PARSER_REVISION whenever extraction logic changes without touching the
+# rules above; PARSER_VERSION tags (and so invalidates) cached parse results.
+PARSER_REVISION = 2
+PARSER_VERSION = hashlib.sha256(repr((
+    PARSER_REVISION,
+    [p.pattern for p in SOFCODE_PATTERNS],
+    DANA_KEYWORDS, ANGSURAN_KEYWORD, CATEGORY_RULES,
+    _AMOUNT_RE.pattern, _COUNT_RE.pattern, _POINT_RE.pattern,
+)).encode()).hexdigest()[:16]
 
 def to_int(num_str: str) -> int:
     """Convert a formatted number string (e.g. '1,057' or '1.234,56') to int.
@@ -137,29 +649,64 @@ def to_int(num_str: str) -> int:
     """
     if not num_str:
         return 0
-    cleaned = re.sub(r"[^\d]", "", num_str)
+    cleaned = _NON_DIGIT_RE.sub("", num_str)
     return int(cleaned) if cleaned else 0
 
-def sum_category(keyword_pattern: str, text: str) -> tuple[int, int]:
+def split_points(text: str) -> list[int]:
+    """Return the start offset of every section window (letter header first)."""
+    return [0] + [m.start() for m in _POINT_RE.finditer(text)]
+
+def _window_end(bounds: list[int], pos: int, default: int) -> int:
+    i = bisect_right(bounds, pos)
+    return bounds[i] if i < len(bounds) else default
+
+def _read_amount(text: str, pos: int, end: int, find_rp: bool = True):
+    """Match '[... Rp.] <amount>' in text[pos:end]; commits to the first 'Rp.'."""
+    if find_rp:
+        rp = _RP_RE.search(text, pos, end)
+        if not rp:
+            return None
+        pos = rp.end()
+    return _AMOUNT_RE.match(text, pos, end)
+
+def _read_amount_count(text: str, pos: int, end: int, find_rp: bool = True):
+    """Read '... Rp. <amount> ... untuk <count> Konsumen' from text[pos:end].
+
+    Each step commits to its first match instead of backtracking into the
+    previous one, so a missing tail costs a single pass over the window.
     """
-    Cari '<keyword_pattern> ... Rp. <amount> ... untuk <count> Konsumen'
-    • Kompatibel dengan karakter kontrol E F, spasi ganda, dsb.
-    • Jika amount == 0 → paksa count = 0
+    a = _read_amount(text, pos, end, find_rp)
+    if not a:
+        return None
+    c = _COUNT_RE.match(text, a.end(), end)
+    if not c:
+        return None
+    return to_int(a.group("amt")), to_int(c.group("cnt"))
+
+def _category_amount_count(text: str, hits: list[int], bounds: list[int]) -> tuple[int, int]:
+    """Amount/count for a category keyword, given the end offsets of its hits.
+
+    Uses the first hit inside a lettered point whose window holds the amount
+    and count; hits in the letter header are skipped unless the letter has no
+    points.  Amount == 0 → count = 0.
+
+    A failed read has already scanned to the end of its window, and a later
+    hit in that window can only find less, so those hits are skipped: every
+    window is read at most once and the cost stays linear in the text.
     """
-    pat = (
-        rf"{keyword_pattern}"                       # kata kunci
-        rf".*?Rp\.\s*[^\d]*"                       # Rp. ... lalu bebas (non‐digit)          
-        rf"(?P<amt>[\d\.,]+)"                      #    ← amount (boleh ada , .)
-        rf".*?untuk\s+[^\d]*"                      # sampai kata 'untuk'
-        rf"(?P<cnt>[\d\.,]+)"                      #    ← count (boleh , .)
-        rf"[^\d]*\s+Konsumen"                      # sebelum kata Konsumen
-    )
-    m = re.search(pat, text, flags=re.I | re.S)
-    if not m:
+    header_end = bounds[1] if len(bounds) > 1 else 0
+    searched_to = header_end
+    for pos in hits:
+        if pos < searched_to:
+            continue
+        end = _window_end(bounds, pos, len(text))
+        found = _read_amount_count(text, pos, end)
+        if found:
+            break
+        searched_to = end
+    else:
         return 0, 0
-
-    amt = to_int(m.group("amt"))
-    cnt = to_int(m.group("cnt"))
+    amt, cnt = found
 
     # --- aturan bisnis: jika amount = 0, acc harus 0 ---
     if amt == 0:
@@ -167,72 +714,251 @@ def sum_category(keyword_pattern: str, text: str) -> tuple[int, int]:
 
     return amt, cnt
 
+@lru_cache(maxsize=64)
+def _keyword_pattern(keyword_pattern: str):
+    return re.compile(keyword_pattern, re.I)
+
+def sum_category(keyword_pattern: str, text: str, bounds: list[int] = None) -> tuple[int, int]:
+    """
+    Cari '<keyword_pattern> ... Rp. <amount> ... untuk <count> Konsumen'
+    • Hanya di dalam poin (a), b), ...) tempat kata kunci ditemukan; kata kunci
+      di kepala surat (mis. "Perihal") dilewati
+    • Kompatibel dengan karakter kontrol E F, spasi ganda, dsb.
+    • Jika amount == 0 → paksa count = 0
+    """
+    hits = [m.end() for m in _keyword_pattern(keyword_pattern).finditer(text)]
+    if not hits:
+        return 0, 0
+    if bounds is None:
+        bounds = split_points(text)
+    return _category_amount_count(text, hits, bounds)
+
+def _keyword_hits(text: str) -> dict:
+    """Single scan: map each keyword group to the end offsets of its hits, in order."""
+    hits = {}
+    pos = 0
+    while True:
+        m = _KEYWORD_SCAN_RE.search(text, pos)
+        if not m:
+            break
+        hits.setdefault(m.lastgroup, []).append(m.end())
+        pos = m.start() + 1
+    return hits
+
+def extract_fields(text: str) -> dict:
+    """Extract Dana Pembayaran and every category column from decoded text.
+
+    Only columns that were found are returned; callers fill in the defaults.
+    """
+    hits = _keyword_hits(text)
+    bounds = split_points(text)
+    fields = {}
+
+    # --- Dana Pembayaran ----------------------------------------------------
+    for i in range(len(DANA_KEYWORDS)):
+        pos = hits.get(f"dana{i}", [None])[0]
+        m = _read_amount(text, pos, _window_end(bounds, pos, len(text)), find_rp=False) if pos is not None else None
+        if m:
+            fields["Dana Pembayaran Jumlah"] = to_int(m.group("amt"))
+            break
+
+    # --- Angsuran (poin a) --------------------------------------------------
+    pos = hits.get("angsuran", [None])[0]
+    if pos is not None:
+        found = _read_amount_count(text, pos, _window_end(bounds, pos, len(text)), find_rp=False)
+        if found:
+            fields["Pembayaran Angsuran Jumlah"], fields["Pembayaran Angsuran Acc"] = found
+
+    # --- Remaining categories (b, c, d, ...) --------------------------------
+    for i, (label, _) in enumerate(CATEGORY_RULES):
+        amt, cnt = _category_amount_count(text, hits.get(f"cat{i}", []), bounds)
+        fields[f"{label} Jumlah"] = amt
+        fields[f"{label} Acc"]    = cnt
+
+    return fields
+
+class LocalSQLite:
+    """Per-thread connections to one SQLite file (WAL), reopened in forked children.
+
+    `schema` holds the statements that create the tables and indexes -- plain
+    SQL or (SQL, parameters) -- and runs on the first connection each process
+    opens.
+    """
+
+    def __init__(self, db_path, schema, timeout=10):
+        self.db_path = db_path
+        self.schema = schema
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ready = False
+
+    def connect(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            if not self._ready:
+                for statement in self.schema:
+                    db.execute(*((statement,) if isinstance(statement, str) else statement))
+                db.commit()
+                self._ready = True
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+class ParseCache:
+    """Parse results keyed on the SHA-256 of the file bytes + PARSER_VERSION.
+
+    Tier one is a per-process LRU; tier two is a SQLite file shared by every
+    process on the host and trimmed oldest-first to `db_max_bytes`.  Hits and
+    misses are counted in the CACHE_* metrics, so parse workers report into
+    the same totals as the web processes.
+    """
+
+    TRIM_EVERY = 64
+
+    def __init__(self, size, db_path=None, db_max_bytes=0):
+        self.size = size
+        self.db_path = db_path
+        self.db_max_bytes = db_max_bytes
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = LocalSQLite(db_path, [
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS parse_cache_last_used ON parse_cache (last_used)",
+            # Results from older rules can never be hit again
+            ("DELETE FROM parse_cache WHERE key NOT LIKE ?", (f"{PARSER_VERSION}:%",)),
+        ], timeout=5)
+        self._puts = 0
+
+    def key(self, file_bytes, digest=None):
+        return f"{PARSER_VERSION}:{digest or hashlib.sha256(file_bytes).hexdigest()}"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                CACHE_MEMORY_HITS.inc()
+                return self._lru[key]
+
+        value = self._db_get(key)
+        if value is not None:
+            CACHE_DISK_HITS.inc()
+            self._remember(key, value)
+            return value
+
+        CACHE_MISSES.inc()
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._db_put(key, value)
+
+    def stats(self):
+        files = metric_files.read()
+        return {
+            'parser_version': PARSER_VERSION,
+            'memory_hits': int(CACHE_MEMORY_HITS.value(files)),
+            'disk_hits': int(CACHE_DISK_HITS.value(files)),
+            'misses': int(CACHE_MISSES.value(files)),
+            'memory_entries': len(self._lru),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+        if self.db_path and os.path.exists(self.db_path):
+            with self._db.connect() as db:
+                db.execute("DELETE FROM parse_cache")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.size:
+                self._lru.popitem(last=False)
+
+    def _db_get(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self._db.connect() as db:
+                row = db.execute("SELECT value FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                db.execute("UPDATE parse_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Parse cache read failed: {str(e)}")
+            return None
+
+    def _db_put(self, key, value):
+        if not self.db_path:
+            return
+        payload = json.dumps(value)
+        try:
+            with self._db.connect() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO parse_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time()),
+                )
+            # Trimming scans the whole table, so only do it every TRIM_EVERY writes
+            self._puts += 1
+            if self._puts % self.TRIM_EVERY == 1:
+                self.trim()
+        except sqlite3.Error as e:
+            logger.warning(f"Parse cache write failed: {str(e)}")
+
+    def trim(self):
+        """Drop the least recently used disk entries above db_max_bytes."""
+        with self._db.connect() as db:
+            db.execute(
+                "DELETE FROM parse_cache WHERE key IN ("
+                " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS total"
+                " FROM parse_cache) WHERE total > ?)",
+                (self.db_max_bytes,),
+            )
+
+parse_cache = ParseCache(PARSE_CACHE_SIZE, PARSE_CACHE_DB, PARSE_CACHE_DB_MAX_BYTES)
+
+def parse_text_fields(file_bytes: bytes, digest=None) -> dict:
+    """Filename-independent parse result for one file, served from parse_cache."""
+    key = parse_cache.key(file_bytes, digest)
+    result = parse_cache.get(key)
+    if result is None:
+        with timed_stage(DECODE_SECONDS):
+            text = extract_text_from_file(file_bytes)
+        sofcode = ""
+        for pat in SOFCODE_PATTERNS:
+            m = pat.search(text)
+            if m:
+                sofcode = m.group(1).upper()
+                break
+        result = {"sofcode": sofcode, "fields": extract_fields(text)}
+        parse_cache.put(key, result)
+    return result
+
+@timed_stage(PARSE_SECONDS)
 def parse_jf_text(file_bytes: bytes, filename: str = "") -> dict:
     """Parse one JF *.txt* file into a structured dict ready for DataFrame."""
 
-    # NOTE: helper `extract_text_from_file` & constant `COLUMNS` are assumed
-    #       to already exist in the original codebase.
-
     try:
-        text = extract_text_from_file(file_bytes)
-        data = {"filename": filename}
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        parsed = parse_text_fields(file_bytes, digest)
+        data = {"filename": filename, "sha256": digest}
 
         # --- init all fields with safe defaults --------------------------------
         for col in COLUMNS[1:]:
             data[col] = 0 if ("Jumlah" in col or "Acc" in col) else ""
 
-        # --- BANK JF/SOFCODE ----------------------------------------------------
-        code_from_file = extract_code_from_filename(filename)
-        if code_from_file:
-            data["BANK JF/SOFCODE"] = code_from_file
-        else:
-            for pat in [
-                r"\(\s*([A-Z0-9]+)\s*\)",
-                r"SOFCODE\s*[:\s]*([A-Z0-9]+)",
-                r"Bank\s+[^\(]*\(\s*([A-Z0-9]+)\s*\)",
-            ]:
-                m = re.search(pat, text, flags=re.I)
-                if m:
-                    data["BANK JF/SOFCODE"] = m.group(1).upper()
-                    break
-
-        # --- Dana Pembayaran ----------------------------------------------------
-        for pat in [
-            r"sejumlah\s+Rp\.\s*[^\d]*(?P<amt>[\d\.,]+)",
-            r"jumlah\s+Rp\.\s*[^\d]*(?P<amt>[\d\.,]+)",
-            r"sebesar\s+Rp\.\s*[^\d]*(?P<amt>[\d\.,]+)",
-        ]:
-            m = re.search(pat, text, flags=re.I)
-            if m:
-                data["Dana Pembayaran Jumlah"] = to_int(m.group("amt"))
-                break
+        # --- BANK JF/SOFCODE (filename first, then letter text) -----------------
+        data["BANK JF/SOFCODE"] = extract_code_from_filename(filename) or parsed["sofcode"]
 
-        # --- Angsuran (poin a) --------------------------------------------------
-        m = re.search(
-            r"a\)\s*Pembayaran\s+angsuran\s+sebesar\s+Rp\.\s*[^\d]*(?P<amt>[\d\.,]+)"  # amount
-            r".*?untuk\s+[^\d]*(?P<cnt>[\d\.,]+)[^\d]*\s+Konsumen",                       # count
-            text,
-            flags=re.I | re.S,
-        )
-        if m:
-            data["Pembayaran Angsuran Jumlah"] = to_int(m.group("amt"))
-            data["Pembayaran Angsuran Acc"]    = to_int(m.group("cnt"))
-
-        # --- Remaining categories (b, c, d, ...) --------------------------------
-        categories = [
-            ("Pembayaran Denda",                       r"Pembayaran\s+denda"),
-            ("Pelunasan dipercepat",                   r"Pembayaran\s+pelunasan\s+dipercepat"),
-            ("Denda Pelunasan dipercepat",             r"Denda\s+pelunasan\s+dipercepat"),
-            ("Penalti Pelunasan dipercepat",           r"Pembayaran\s+penalti\s+pelunasan\s+dipercepat"),
-            ("Pelunasan dipercepat case Asuransi",     r"pelunasan\s+dipercepat\s+karena\s+pencairan\s+tagihan\s+asuransi"),
-            ("Penalti pelunasan dipercepat case Asuransi", r"penalti\s+pelunasan\s+dipercepat\s+karena\s+pencairan\s+tagihan\s+asuransi"),
-            ("Pembayaran Recovery",                    r"Pembayaran\s+recovery"),
-            ("Penghapusan denda konsumen",             r"Penghapusan\s+denda"),
-        ]
-        for label, kw_pat in categories:
-            amt, cnt = sum_category(kw_pat, text)
-            data[f"{label} Jumlah"] = amt
-            data[f"{label} Acc"]    = cnt
+        # --- Dana Pembayaran + categories (single scan) -------------------------
+        data.update(parsed["fields"])
 
         return data
 
@@ -243,240 +969,204 @@ def parse_jf_text(file_bytes: bytes, filename: str = "") -> dict:
             data[col] = 0 if ("Jumlah" in col or "Acc" in col) else ""
         return data
 
-    """Parse JF text with enhanced error handling and logging."""
-    try:
-        text = extract_text_from_file(file_bytes)
-        data = {"filename": filename}
-        
-        logger.info(f"Processing file: {filename}")
-        
-        # Initialize all fields with default values first
-        for col in COLUMNS[1:]:
-            if "Jumlah" in col or "Acc" in col:
-                data[col] = 0
-            else:
-                data[col] = ""
-        
-        code_from_file = extract_code_from_filename(filename)
-        if code_from_file:
-            data["BANK JF/SOFCODE"] = code_from_file
-            logger.info(f"SOFCODE dari filename: {code_from_file} ({filename})")
-        else:
-            # Fallback ke isi teks jika pola nama file tidak terbaca
-            patterns_bank = [
-                r"\(\s*([A-Z0-9]+)\s*\)",                      # (JFCS2)
-                r"SOFCODE\s*[:\s]*([A-Z0-9]+)",
-                r"Bank\s+[^\(]*\(\s*([A-Z0-9]+)\s*\)",         # “Bank XXX (JFCS2)”
-            ]
-            for pat in patterns_bank:
-                m = re.search(pat, text, flags=re.I)
-                if m:
-                    data["BANK JF/SOFCODE"] = m.group(1).upper()
-                    logger.info(f"SOFCODE dari teks: {m.group(1)} ({filename})")
-                    break
-            else:
-                logger.warning(f"SOFCODE tidak ditemukan dalam teks maupun nama file {filename}")
-                data["BANK JF/SOFCODE"] = ""
-
-        # Extract Dana Pembayaran with multiple patterns
-        patterns_dana = [
-            r"sejumlah\s+Rp\.\s*([^\d]*(?P<amt>[\d\.,]+))",
-            r"jumlah\s+Rp\.\s*([^\d]*(?P<amt>[\d\.,]+))",
-            r"sebesar\s+Rp\.\s*([^\d]*(?P<amt>[\d\.,]+))"
-        ]
-        
-        for pattern in patterns_dana:
-            m = re.search(pattern, text, flags=re.IGNORECASE)
-            if m:
-                try:
-                    data["Dana Pembayaran Jumlah"] = to_int(m.group('amt'))
-                    break
-                except:
-                    continue
-
-        # Extract Pembayaran Angsuran (point a) with simpler approach
-        try:
-            pattern_angsuran = (
-                r"a\)\s*Pembayaran\s+angsuran\s+sebesar\s+Rp\.\s*[^\d]*"
-                r"(?P<amt>[\d\.,]+).*?untuk\s+[^\d]*(?P<cnt>\d+)[^\d]*\s+Konsumen"
-            )
-            m = re.search(pattern_angsuran, text, flags=re.IGNORECASE|re.DOTALL)
-            if m:
-                data["Pembayaran Angsuran Jumlah"] = to_int(m.group('amt'))
-                data["Pembayaran Angsuran Acc"] = int(m.group('cnt'))
-        except Exception as e:
-            logger.warning(f"Error parsing angsuran in {filename}: {str(e)}")
-
-        # Extract other categories using simplified sum_category function
-        categories = [
-            ("Pembayaran Denda", r"Pembayaran\s+denda"),
-            ("Pelunasan dipercepat", r"Pembayaran\s+pelunasan\s+dipercepat"),
-            ("Denda Pelunasan dipercepat", r"Denda\s+pelunasan\s+dipercepat"),
-            ("Penalti Pelunasan dipercepat", r"Pembayaran\s+penalti\s+pelunasan\s+dipercepat"),
-            ("Pelunasan dipercepat case Asuransi", r"pelunasan\s+dipercepat\s+karena\s+pencairan\s+tagihan\s+asuransi"),
-            ("Penalti pelunasan dipercepat case Asuransi", r"penalti\s+pelunasan\s+dipercepat\s+karena\s+pencairan\s+tagihan\s+asuransi"),
-            ("Pembayaran Recovery", r"Pembayaran\s+recovery"),
-            ("Penghapusan denda konsumen", r"Penghapusan\s+denda"),
-        ]
-        
-        for category_name, pattern in categories:
-            try:
-                amt, cnt = sum_category(pattern, text)
-                data[f"{category_name} Jumlah"] = amt
-                data[f"{category_name} Acc"] = cnt
-            except Exception as e:
-                logger.warning(f"Error parsing {category_name} in {filename}: {str(e)}")
-                data[f"{category_name} Jumlah"] = 0
-                data[f"{category_name} Acc"] = 0
-
-        logger.info(f"Successfully processed {filename}")
-        return data
-        
-    except Exception as e:
-        logger.error(f"Error processing file {filename}: {str(e)}")
-        # Return safe data structure
-        data = {"filename": filename, "error": str(e)}
-        for col in COLUMNS[1:]:
-            if "Jumlah" in col or "Acc" in col:
-                data[col] = 0
-            else:
-                data[col] = ""
-        return data
+# Header groups: (title, number of columns)
+HEADER_GROUPS = [
+    ("NO", 1),
+    ("BANK JF/SOFCODE", 1),
+    ("Dana Pembayaran", 1),
+    ("Pembayaran Angsuran", 2),
+    ("Pembayaran Denda", 2),
+    ("Pelunasan dipercepat", 2),
+    ("Denda Pelunasan dipercepat", 2),
+    ("Penalti Pelunasan dipercepat", 2),
+    ("Pelunasan case Asuransi", 2),
+    ("Penalti case Asuransi", 2),
+    ("Pembayaran Recovery", 2),
+    ("Penghapusan denda konsumen", 2),
+]
 
-def create_excel_with_styling(df, output_path):
-    """Create Excel file with enhanced styling and error handling."""
+def _register_styles(wb):
+    """Add the shared named styles used by every cell in the workbook."""
+    side = Side(border_style="thin", color="000000")
+    border = Border(left=side, right=side, top=side, bottom=side)
+    wb.add_named_style(NamedStyle(
+        name="rekon_header",
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+        border=border,
+        alignment=Alignment(horizontal="center", vertical="center"),
+    ))
+    wb.add_named_style(NamedStyle(name="rekon_text", border=border, alignment=Alignment(horizontal="center")))
+    wb.add_named_style(NamedStyle(name="rekon_number", border=border, alignment=Alignment(horizontal="right")))
+
+def _header_rows():
+    """Two header rows plus the merged ranges that join them."""
+    top, sub, merges = [], [], []
+    col = 1
+    for title, span in HEADER_GROUPS:
+        if span == 1:
+            top.append(title)
+            sub.append(None)
+            merges.append(f"{get_column_letter(col)}1:{get_column_letter(col)}2")
+        else:
+            top += [title] + [None] * (span - 1)
+            sub += ["Jumlah", "Acc"]
+            merges.append(f"{get_column_letter(col)}1:{get_column_letter(col + span - 1)}1")
+        col += span
+    return top, sub, merges
+
+def _column_widths(df, header_rows):
+    """Width per column from the longest value (min 10, max 30)."""
+    widths = []
+    for i, col in enumerate(df.columns):
+        labels = [row[i] for row in header_rows if row[i] is not None]
+        longest = max([len(str(v)) for v in labels] + [int(df[col].astype(str).str.len().max()) if len(df) else 0])
+        widths.append(min(max(longest + 2, 10), 30))
+    return widths
+
+# Numeric columns, and the categories they belong to ("Dana Pembayaran" has no Acc)
+AMOUNT_COLUMNS = COLUMNS[2:]
+CATEGORIES = [col[:-len(" Jumlah")] for col in COLUMNS if col.endswith(" Jumlah")]
+
+def summarize(df):
+    """Summary tables for the export: {sheet title: DataFrame}.
+
+    * Per SOFCODE  - file count and every Jumlah/Acc column summed per bank
+    * Per Kategori - each category's total Jumlah and Acc over all files
+    * Total        - files, banks, Dana Pembayaran and the category totals
+    """
+    amounts = df[AMOUNT_COLUMNS].astype("int64")
+    sofcodes = df["BANK JF/SOFCODE"].astype(str)
+
+    per_sofcode = amounts.groupby(sofcodes, sort=True).sum()
+    per_sofcode.insert(0, "Files", sofcodes.groupby(sofcodes, sort=True).size())
+    per_sofcode = per_sofcode.reset_index()
+
+    totals = amounts.sum()
+    per_category = pd.DataFrame({
+        "Kategori": CATEGORIES,
+        "Jumlah": [totals[f"{c} Jumlah"] for c in CATEGORIES],
+        "Acc": [totals.get(f"{c} Acc") for c in CATEGORIES],
+    })
+
+    jumlah = [col for col in AMOUNT_COLUMNS if col.endswith(" Jumlah") and col != "Dana Pembayaran Jumlah"]
+    acc = [col for col in AMOUNT_COLUMNS if col.endswith(" Acc")]
+    grand = pd.DataFrame({
+        "Files": [len(df)],
+        "Banks": [len(per_sofcode)],
+        "Dana Pembayaran Jumlah": [totals["Dana Pembayaran Jumlah"]],
+        "Total Kategori Jumlah": [totals[jumlah].sum()],
+        "Total Kategori Acc": [totals[acc].sum()],
+    })
+
+    return {"Per SOFCODE": per_sofcode, "Per Kategori": per_category, "Total": grand}
+
+VALIDATION_COLUMNS = ["NO", "BANK JF/SOFCODE", "Check", "Column", "Actual", "Expected"]
+
+def validate(df, amount_tolerance=None, relative_tolerance=None, dana_excludes=None):
+    """Batch-wide consistency checks; returns one row per failed check.
+
+    * dana_mismatch      - Dana Pembayaran Jumlah is not the sum of the category
+                           Jumlah columns (within the tolerances)
+    * acc_without_amount - a category has an Acc count but a zero Jumlah
+    * amount_without_acc - a category has a Jumlah but no Acc count
+    * missing_sofcode    - no BANK JF/SOFCODE from the filename or the letter
+
+    Every check is a whole-column numpy comparison; the only Python loop is
+    over the categories.  Columns follow VALIDATION_COLUMNS.
+    """
+    amount_tolerance = VALIDATION_AMOUNT_TOLERANCE if amount_tolerance is None else amount_tolerance
+    relative_tolerance = VALIDATION_RELATIVE_TOLERANCE if relative_tolerance is None else relative_tolerance
+    dana_excludes = VALIDATION_DANA_EXCLUDES if dana_excludes is None else dana_excludes
+
+    values = df[AMOUNT_COLUMNS].to_numpy(dtype="int64")
+    position = {col: i for i, col in enumerate(AMOUNT_COLUMNS)}
+    numbers, sofcodes = df["NO"].to_numpy(), df["BANK JF/SOFCODE"].astype(str).to_numpy()
+    found = []
+
+    def flag(mask, check, column, actual, expected):
+        if mask.any():
+            found.append(pd.DataFrame({
+                "NO": numbers[mask], "BANK JF/SOFCODE": sofcodes[mask], "Check": check, "Column": column,
+                "Actual": actual[mask], "Expected": expected[mask] if isinstance(expected, np.ndarray) else expected,
+            }))
+
+    dana = values[:, position["Dana Pembayaran Jumlah"]]
+    components = [position[f"{c} Jumlah"] for c in CATEGORIES[1:] if c not in dana_excludes]
+    total = values[:, components].sum(axis=1)
+    allowed = np.maximum(amount_tolerance, relative_tolerance * np.abs(dana))
+    flag(np.abs(dana - total) > allowed, "dana_mismatch", "Dana Pembayaran Jumlah", dana, total)
+
+    for category in CATEGORIES[1:]:
+        amount = values[:, position[f"{category} Jumlah"]]
+        count = values[:, position[f"{category} Acc"]]
+        flag((amount == 0) & (count != 0), "acc_without_amount", f"{category} Acc", count, 0)
+        flag((amount != 0) & (count == 0), "amount_without_acc", f"{category} Acc", count, None)
+
+    missing = np.char.str_len(np.char.strip(sofcodes.astype(str))) == 0
+    flag(missing, "missing_sofcode", "BANK JF/SOFCODE", sofcodes, None)
+
+    if not found:
+        return pd.DataFrame(columns=VALIDATION_COLUMNS)
+    return pd.concat(found, ignore_index=True).sort_values(["NO", "Check"], kind="stable", ignore_index=True)
+
+def validation_report(issues):
+    """JSON-ready {'checks': {check: count}, 'issues': [...]} for a validate() result."""
+    return {
+        'checks': {check: int(n) for check, n in issues["Check"].value_counts().sort_index().items()},
+        'issues': json.loads(issues.to_json(orient="records")),
+    }
+
+def create_excel_with_styling(df, output_path, summaries=None):
+    """Write the styled workbook in a single streaming pass.
+
+    Uses an openpyxl write-only sheet: widths and merges are set up front from
+    the DataFrame, then headers and data rows are streamed with shared named
+    styles instead of styling a reloaded workbook cell by cell.  Tables from
+    `summaries` ({title: DataFrame}) follow as extra sheets in the same pass.
+    """
     try:
-        # Write DataFrame to Excel first
         logger.info("Creating Excel file...")
-        with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, header=False, startrow=2)
-
-        # Load workbook for styling
-        wb = load_workbook(output_path)
-        ws = wb.active
-        
-        try:
-            # Define styles with error handling
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            border = Border(
-                left=Side(border_style="thin", color="000000"),
-                right=Side(border_style="thin", color="000000"),
-                top=Side(border_style="thin", color="000000"),
-                bottom=Side(border_style="thin", color="000000")
-            )
-        except Exception as e:
-            logger.warning(f"Error creating styles: {str(e)}. Using default styles.")
-            header_font = Font(bold=True)
-            header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-            border = None
-        
-        # Header groups
-        groups = [
-            ("NO", 1),
-            ("BANK JF/SOFCODE", 1),
-            ("Dana Pembayaran", 1),
-            ("Pembayaran Angsuran", 2),
-            ("Pembayaran Denda", 2),
-            ("Pelunasan dipercepat", 2),
-            ("Denda Pelunasan dipercepat", 2),
-            ("Penalti Pelunasan dipercepat", 2),
-            ("Pelunasan case Asuransi", 2),
-            ("Penalti case Asuransi", 2),
-            ("Pembayaran Recovery", 2),
-            ("Penghapusan denda konsumen", 2),
-        ]
-
-        # Create headers with error handling
-        col = 1
-        for title, span in groups:
-            try:
-                if span == 1:
-                    ws.merge_cells(start_row=1, start_column=col, end_row=2, end_column=col)
-                    cell = ws.cell(row=1, column=col, value=title)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                    if header_font:
-                        cell.font = header_font
-                    if header_fill:
-                        cell.fill = header_fill
-                    if border:
-                        cell.border = border
-                    col += 1
-                else:
-                    ws.merge_cells(start_row=1, start_column=col, end_row=1, end_column=col+span-1)
-                    cell = ws.cell(row=1, column=col, value=title)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                    if header_font:
-                        cell.font = header_font
-                    if header_fill:
-                        cell.fill = header_fill
-                    if border:
-                        cell.border = border
-                    
-                    # Sub headers
-                    subcell1 = ws.cell(row=2, column=col, value="Jumlah")
-                    subcell1.alignment = Alignment(horizontal="center", vertical="center")
-                    if header_font:
-                        subcell1.font = header_font
-                    if header_fill:
-                        subcell1.fill = header_fill
-                    if border:
-                        subcell1.border = border
-                    
-                    subcell2 = ws.cell(row=2, column=col+1, value="Acc")
-                    subcell2.alignment = Alignment(horizontal="center", vertical="center")
-                    if header_font:
-                        subcell2.font = header_font
-                    if header_fill:
-                        subcell2.fill = header_fill
-                    if border:
-                        subcell2.border = border
-                    
-                    col += span
-            except Exception as e:
-                logger.warning(f"Error creating header for {title}: {str(e)}")
-                col += span  # Continue with next column
+        wb = Workbook(write_only=True)
+        _register_styles(wb)
+        ws = wb.create_sheet()
+
+        top, sub, merges = _header_rows()
+        for i, width in enumerate(_column_widths(df, (top, sub)), start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+        for cell_range in merges:
+            ws.merged_cells.add(cell_range)
+
+        def styled(value, style):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            return cell
+
+        ws.append([styled(v, "rekon_header") for v in top])
+        ws.append([styled(v, "rekon_header") for v in sub])
+
+        # Data rows: first three columns centered, numeric columns right-aligned
+        styles = ["rekon_text" if i < 3 else "rekon_number" for i in range(len(df.columns))]
+        for values in df.itertuples(index=False, name=None):
+            ws.append([styled(v, s) for v, s in zip(values, styles)])
+
+        for title, table in (summaries or {}).items():
+            sheet = wb.create_sheet(title)
+            header = list(table.columns)
+            for i, width in enumerate(_column_widths(table, (header,)), start=1):
+                sheet.column_dimensions[get_column_letter(i)].width = width
+            sheet.append([styled(v, "rekon_header") for v in header])
+            # Label column centered like the SOFCODE column, totals right-aligned
+            for values in table.itertuples(index=False, name=None):
+                sheet.append([
+                    styled(None if pd.isna(v) else v, "rekon_text" if i == 0 and isinstance(v, str) else "rekon_number")
+                    for i, v in enumerate(values)
+                ])
 
-        # Style data cells with error handling
-        try:
-            for row in range(3, ws.max_row + 1):
-                for col in range(1, ws.max_column + 1):
-                    try:
-                        cell = ws.cell(row=row, column=col)
-                        if border:
-                            cell.border = border
-                        if col > 3:  # Numeric columns
-                            cell.alignment = Alignment(horizontal="right")
-                        else:
-                            cell.alignment = Alignment(horizontal="center")
-                    except Exception as e:
-                        logger.warning(f"Error styling cell ({row}, {col}): {str(e)}")
-                        continue
-        except Exception as e:
-            logger.warning(f"Error styling data cells: {str(e)}")
-
-        # Auto-adjust column widths with error handling
-        try:
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        cell_value = str(cell.value) if cell.value is not None else ""
-                        if len(cell_value) > max_length:
-                            max_length = len(cell_value)
-                    except:
-                        pass
-                adjusted_width = min(max(max_length + 2, 10), 30)  # Min 10, Max 30
-                ws.column_dimensions[column_letter].width = adjusted_width
-        except Exception as e:
-            logger.warning(f"Error adjusting column widths: {str(e)}")
-
-        # Save workbook
         wb.save(output_path)
         logger.info(f"Excel file created successfully: {output_path}")
         return True
-        
+
     except Exception as e:
         logger.error(f"Critical error creating Excel file: {str(e)}")
         # Try to create a basic Excel file without styling as fallback
@@ -489,629 +1179,1457 @@ def create_excel_with_styling(df, output_path):
             logger.error(f"Fallback Excel creation also failed: {str(fallback_error)}")
             return False
 
-def process_files(upload_folder, output_path):
-    """Process uploaded files with enhanced error handling."""
+def typed_frame(df):
+    """Fix the COLUMNS dtypes for machine-readable exports: int64 amounts/counts."""
+    return df.astype({col: ("string" if col == "BANK JF/SOFCODE" else "int64") for col in df.columns})
+
+def write_csv(df, output_path, summaries=None):
+    """Stream rows to CSV in EXPORT_CHUNK_ROWS chunks."""
     try:
-        rows = []
-        no = 1
-        processed_files = 0
-        error_files = []
-        
-        for filename in os.listdir(upload_folder):
-            if filename.endswith('.txt'):
-                file_path = os.path.join(upload_folder, filename)
-                try:
-                    with open(file_path, 'rb') as f:
-                        raw = f.read()
-                    
-                    data = parse_jf_text(raw, filename)
-                    
-                    if "error" in data:
-                        error_files.append(filename)
-                        logger.warning(f"Error in file {filename}: {data['error']}")
-                    
-                    row = [no] + [data.get(col, "") for col in COLUMNS[1:]]
-                    rows.append(row)
-                    processed_files += 1
-                    no += 1
-                    
-                except Exception as e:
-                    error_files.append(filename)
-                    logger.error(f"Failed to process file {filename}: {str(e)}")
+        typed_frame(df).to_csv(output_path, index=False, chunksize=EXPORT_CHUNK_ROWS)
+        logger.info(f"CSV file created successfully: {output_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error creating CSV file: {str(e)}")
+        return False
+
+def write_jsonl(df, output_path, summaries=None):
+    """One JSON object per row, keyed by COLUMNS."""
+    try:
+        typed_frame(df).to_json(output_path, orient="records", lines=True, force_ascii=False)
+        logger.info(f"JSON Lines file created successfully: {output_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error creating JSON Lines file: {str(e)}")
+        return False
+
+def write_parquet(df, output_path, summaries=None):
+    """Parquet export; needs the optional pyarrow (or fastparquet) package."""
+    try:
+        typed_frame(df).to_parquet(output_path, index=False)
+        logger.info(f"Parquet file created successfully: {output_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error creating Parquet file: {str(e)}")
+        return False
+
+# Output formats: name -> (label, file extension, mimetype, writer(df, output_path, summaries) -> bool).
+# Only Excel has room for the summary sheets; the flat formats hold the per-file rows.
+EXPORT_FORMATS = {
+    'xlsx': ('Excel', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+             create_excel_with_styling),
+    'csv': ('CSV', 'csv', 'text/csv', write_csv),
+    'jsonl': ('JSON Lines', 'jsonl', 'application/x-ndjson', write_jsonl),
+    'parquet': ('Parquet', 'parquet', 'application/vnd.apache.parquet', write_parquet),
+}
+
+# Formats whose writer needs an optional package: name -> modules that can provide it.
+FORMAT_DEPENDENCIES = {
+    'parquet': ('pyarrow', 'fastparquet'),
+}
+
+def format_unavailable(fmt):
+    """Return why `fmt` can't be written here, or None if it can.
+
+    Checked before any parsing, so a missing optional package is reported up
+    front instead of failing the job (and losing the batch) after the work.
+    """
+    modules = FORMAT_DEPENDENCIES.get(fmt, ())
+    if modules and not any(importlib.util.find_spec(module) for module in modules):
+        return f"{EXPORT_FORMATS[fmt][0]} export needs the {' or '.join(modules)} package, which is not installed"
+    return None
+
+def save_parsed_rows(upload_folder, parsed):
+    """Store parse results ({filename: data}) next to the upload."""
+    path = os.path.join(upload_folder, PARSED_ROWS_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(parsed, f)
+    os.replace(path + '.tmp', path)
+
+def load_parsed_rows(upload_folder):
+    """Load parse results stored by save_parsed_rows ({} if there are none)."""
+    path = os.path.join(upload_folder, PARSED_ROWS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_seen_files(upload_folder, seen):
+    """Store {filename: {size, mtime_ns, sha256, data}} for files process_files parsed."""
+    path = os.path.join(upload_folder, SEEN_FILES_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'parser_version': PARSER_VERSION, 'files': seen}, f)
+    os.replace(path + '.tmp', path)
+
+def load_seen_files(upload_folder):
+    """Load entries stored by save_seen_files ({} if there are none or the parser changed)."""
+    path = os.path.join(upload_folder, SEEN_FILES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        stored = json.load(f)
+    return stored['files'] if stored.get('parser_version') == PARSER_VERSION else {}
+
+def split_seen_files(upload_folder, filenames, seen):
+    """Split TXT files into rows that can be reused and files that must be parsed.
+
+    A file is reused when its name is in `seen` with the same size and mtime,
+    or, failing that, the same SHA-256 (the file was written again with the
+    same content).  Returns (reused {filename: data}, updated seen entries,
+    filenames to parse).  Entries for the files to parse get their new hash
+    and stat but no data yet.
+    """
+    reused, entries, stale = {}, {}, []
+    for filename in filenames:
+        path = os.path.join(upload_folder, filename)
+        st = os.stat(path)
+        entry = seen.get(filename)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            reused[filename], entries[filename] = entry['data'], entry
+            continue
+        digest = file_sha256(path)
+        if entry and entry['sha256'] == digest:
+            reused[filename] = entry['data']
+        else:
+            stale.append(filename)
+        entries[filename] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest,
+                             'data': entry['data'] if filename in reused else None}
+    return reused, entries, stale
+
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+def get_parse_pool(workers):
+    """Return a long-lived process pool with `workers` parser processes.
+
+    Pools are created lazily from job threads, so workers come from a
+    forkserver rather than forking this multi-threaded process (a fork can
+    inherit a lock another thread holds and deadlock the child).
+    """
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            pool = _parse_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+        return pool
+
+def discard_parse_pool(workers, pool):
+    """Drop a broken pool so the next get_parse_pool builds a fresh one."""
+    with _parse_pools_lock:
+        if _parse_pools.get(workers) is pool:
+            del _parse_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_jf_file(file_path):
+    """Read and parse one TXT file from disk (runs inside pool workers)."""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    return parse_jf_text(raw, os.path.basename(file_path))
+
+def _parse_file_safe(file_path):
+    """parse_jf_file that reports read failures instead of raising: (data, error)."""
+    try:
+        return parse_jf_file(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+def iter_parse_files(file_paths, workers=None):
+    """Parse TXT files, yielding (file_path, data, error) in input order.
+
+    With `workers` > 1 (default PARSE_WORKERS) and at least PARALLEL_MIN_FILES
+    paths, files are parsed on the shared process pool in chunks; results are
+    streamed back in order, so memory stays flat on very large batches.
+
+    If a pool worker dies (BrokenProcessPool), the pool is replaced and the
+    files not yet returned are retried once on the new one.
+    """
+    workers = PARSE_WORKERS if workers is None else workers
+    if workers <= 1 or len(file_paths) < PARALLEL_MIN_FILES:
+        for file_path in file_paths:
+            yield (file_path, *_parse_file_safe(file_path))
+        return
+
+    for attempt in (1, 2):
+        pool = get_parse_pool(workers)
+        chunksize = max(1, min(64, len(file_paths) // (workers * 4)))
+        done = 0
+        try:
+            for file_path, (data, error) in zip(file_paths, pool.map(_parse_file_safe, file_paths,
+                                                                    chunksize=chunksize)):
+                yield file_path, data, error
+                done += 1
+            return
+        except BrokenProcessPool:
+            discard_parse_pool(workers, pool)
+            if attempt == 2:
+                raise
+            logger.warning(f"Parse pool broke after {done} files; retrying the rest on a new pool")
+            file_paths = file_paths[done:]
+
+class RowBuffer:
+    """Packed, typed rows for one batch, filled straight from parser dicts.
+
+    Amounts and counts go into a preallocated int64 array (AMOUNT_COLUMNS
+    order, grown by doubling) and SOFCODEs into a list, so no per-file row
+    list is built and to_frame() needs no dtype inference: NO and every
+    amount are int64, BANK JF/SOFCODE is categorical.
+    """
+    __slots__ = ('values', 'sofcodes', 'size')
+
+    _amounts = operator.itemgetter(*AMOUNT_COLUMNS)
+
+    def __init__(self, capacity=0):
+        self.values = np.zeros((max(capacity, 16), len(AMOUNT_COLUMNS)), dtype=np.int64)
+        self.sofcodes = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, data):
+        if self.size == len(self.values):
+            self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+        self.values[self.size] = self._amounts(data)
+        self.sofcodes.append(data["BANK JF/SOFCODE"])
+        self.size += 1
+
+    def to_frame(self):
+        """DataFrame with COLUMNS, viewing the packed amounts without a copy."""
+        df = pd.DataFrame(self.values[:self.size], columns=AMOUNT_COLUMNS, copy=False)
+        df.insert(0, "BANK JF/SOFCODE", pd.Categorical(self.sofcodes))
+        df.insert(0, "NO", np.arange(1, self.size + 1, dtype=np.int64))
+        return df
+
+def collect_rows(results, total=None, progress=None):
+    """Pack (filename, data, error) results into a RowBuffer, numbered in order.
+
+    Returns (rows, error_files).  Files that could not be read get no row;
+    files that parsed with an error still get a zero-filled row.
+    """
+    rows = RowBuffer(total or 0)
+    error_files = []
+
+    for i, (filename, data, error) in enumerate(results, start=1):
+        if error is not None:
+            error_files.append(filename)
+            FILES_ERRORED.inc()
+            logger.error(f"Failed to process file {filename}: {error}")
+        else:
+            if "error" in data:
+                error_files.append(filename)
+                FILES_ERRORED.inc()
+                logger.warning(f"Error in file {filename}: {data['error']}")
+
+            rows.append(data)
+            FILES_PROCESSED.inc()
+
+        if progress:
+            progress(i, total)
+
+    return rows, error_files
+
+def result_message(rows, error_files, issues=0):
+    message = f"Successfully processed {len(rows)} files"
+    if error_files:
+        message += f" ({len(error_files)} files had errors)"
+    if issues:
+        message += f" ({issues} validation issues)"
+    return message
+
+def export_rows(rows, output_path, fmt='xlsx'):
+    """Write collected rows to `output_path` as `fmt`; returns (success, validation issues).
+
+    Builds the DataFrame, the summary tables and the validation issues (all
+    vectorized); Excel gets the summaries plus a Validasi sheet, the flat
+    formats only the rows.
+    """
+    with timed_stage(DATAFRAME_SECONDS):
+        df = rows.to_frame()
+        summaries = summarize(df) if SUMMARY_SHEETS and fmt == 'xlsx' else None
+        issues = validate(df)
+    if fmt == 'xlsx':
+        summaries = dict(summaries or {}, Validasi=issues)
+
+    _, _, _, writer = EXPORT_FORMATS[fmt]
+    with timed_stage(EXPORT_SECONDS):
+        success = writer(df, output_path, summaries)
+    return success, issues
+
+def process_files(upload_folder, output_path, workers=None, progress=None, fmt='xlsx', record=True):
+    """Process uploaded files with enhanced error handling.
+
+    Rows already parsed during upload (PARSED_ROWS_FILE) or by an earlier
+    run over the same folder (SEEN_FILES_FILE) are reused; only new or
+    changed TXT files go through iter_parse_files, so adding files to a
+    session costs in proportion to what was added.  Rows are always ordered
+    by filename.  `progress(done, total)` is called as each file finishes.
+    `fmt` picks the writer from EXPORT_FORMATS.  With `record`, the rows are
+    added to the history store.
+    """
+    try:
+        parsed = load_parsed_rows(upload_folder)
+        on_disk = sorted(f for f in os.listdir(upload_folder) if f.endswith('.txt') and f not in parsed)
+        reused, seen, stale = split_seen_files(upload_folder, on_disk, load_seen_files(upload_folder))
+        parsed.update(reused)
+        filenames = sorted(set(parsed) | set(stale))
+        fresh = iter_parse_files([os.path.join(upload_folder, f) for f in stale], workers)
+        if stale:
+            logger.info(f"Parsing {len(stale)} new or changed file(s), reusing {len(filenames) - len(stale)}")
+
+        def results():
+            for filename in filenames:
+                if filename in parsed:
+                    data, error = parsed[filename], None
+                else:
+                    _, data, error = next(fresh)
+                    if error is None:
+                        seen[filename]['data'] = data
+                yield filename, data, error
+
+        if progress:
+            progress(0, len(filenames))
+        results = recording_history(results()) if record else results()
+        rows, error_files = collect_rows(results, len(filenames), progress)
+        save_seen_files(upload_folder, {f: e for f, e in seen.items() if e['data'] is not None})
 
         if not rows:
             logger.error("No valid data found in any files")
             return False, "No valid data found in uploaded files"
 
-        # Create DataFrame
-        df = pd.DataFrame(rows, columns=COLUMNS)
-        
-        # Create Excel with styling
-        success = create_excel_with_styling(df, output_path)
-        
+        success, issues = export_rows(rows, output_path, fmt)
+        with open(os.path.join(upload_folder, VALIDATION_FILE), 'w') as f:
+            json.dump(validation_report(issues), f)
+
         if success:
-            message = f"Successfully processed {processed_files} files"
-            if error_files:
-                message += f" ({len(error_files)} files had errors)"
-            return True, message
+            return True, result_message(rows, error_files, len(issues))
         else:
-            return False, "Failed to create Excel file"
+            return False, f"Failed to create {EXPORT_FORMATS[fmt][0]} file"
             
     except Exception as e:
         logger.error(f"Error in process_files: {str(e)}")
         return False, f"Processing error: {str(e)}"
 
-@app.route('/')
-def index():
-    """Serve the main page and clear session."""
-    session.clear()
-    # Return the HTML content directly instead of using template
-    return '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Rekon JF Processor - FIFGroup</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-        body { font-family: 'Inter', sans-serif; }
-        
-        .gradient-bg {
-            background: linear-gradient(135deg, #1e3a8a 0%, #3b82f6 35%, #60a5fa 70%, #93c5fd 100%);
-        }
-        
-        .fifgroup-gradient {
-            background: linear-gradient(135deg, #1e40af 0%, #2563eb 50%, #3b82f6 100%);
-        }
-        
-        .fifgroup-primary { background-color: #1e40af; }
-        .fifgroup-secondary { background-color: #2563eb; }
-        .fifgroup-accent { background-color: #3b82f6; }
-        
-        .glass-effect {
-            background: rgba(255, 255, 255, 0.98);
-            backdrop-filter: blur(15px);
-            border: 1px solid rgba(59, 130, 246, 0.2);
-            box-shadow: 0 25px 50px -12px rgba(0, 0, 0, 0.15);
-        }
-        
-        .file-drop-zone {
-            border: 2px dashed #3b82f6;
-            transition: all 0.3s ease;
-            background: linear-gradient(145deg, #f8fafc 0%, #f1f5f9 100%);
-        }
-        
-        .file-drop-zone.dragover {
-            border-color: #1e40af;
-            background: linear-gradient(145deg, #eff6ff 0%, #dbeafe 100%);
-            transform: scale(1.02);
-        }
-        
-        .progress-bar {
-            transition: width 0.4s ease;
-            background: linear-gradient(90deg, #1e40af 0%, #2563eb 50%, #3b82f6 100%);
-        }
-        
-        .fifgroup-btn-primary {
-            background: linear-gradient(135deg, #1e40af 0%, #2563eb 100%);
-            transition: all 0.3s ease;
-        }
-        
-        .fifgroup-btn-primary:hover {
-            background: linear-gradient(135deg, #1e3a8a 0%, #1d4ed8 100%);
-            transform: translateY(-2px);
-            box-shadow: 0 10px 25px -5px rgba(30, 64, 175, 0.4);
-        }
-        
-        .fifgroup-btn-process {
-            background: linear-gradient(135deg, #2563eb 0%, #3b82f6 100%);
-        }
-        
-        .fifgroup-btn-process:hover {
-            background: linear-gradient(135deg, #1d4ed8 0%, #2563eb 100%);
-            transform: translateY(-2px);
-            box-shadow: 0 10px 25px -5px rgba(37, 99, 235, 0.4);
-        }
-        
-        .fifgroup-btn-download {
-            background: linear-gradient(135deg, #059669 0%, #10b981 100%);
-        }
-        
-        .fifgroup-btn-download:hover {
-            background: linear-gradient(135deg, #047857 0%, #059669 100%);
-            transform: translateY(-2px);
-            box-shadow: 0 10px 25px -5px rgba(5, 150, 105, 0.4);
-        }
-        
-        .corporate-header {
-            background: linear-gradient(135deg, #1e40af 0%, #3b82f6 50%, #60a5fa 100%);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-        }
-        
-        .pulse-dot {
-            animation: pulse 2s cubic-bezier(0.4, 0, 0.6, 1) infinite;
-        }
-        
-        @keyframes pulse {
-            0%, 100% { opacity: 1; }
-            50% { opacity: 0.5; }
-        }
-        
-        .file-item {
-            animation: slideIn 0.3s ease-out;
-            background: linear-gradient(145deg, #f8fafc 0%, #f1f5f9 100%);
-            border: 1px solid rgba(59, 130, 246, 0.1);
-        }
-        
-        @keyframes slideIn {
-            from { opacity: 0; transform: translateY(10px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        .success-checkmark {
-            animation: checkmark 0.6s ease-in-out;
-        }
-        
-        @keyframes checkmark {
-            0% { transform: scale(0); }
-            50% { transform: scale(1.2); }
-            100% { transform: scale(1); }
-        }
-        
-        .step-active {
-            background: linear-gradient(135deg, #1e40af 0%, #2563eb 100%);
-            box-shadow: 0 0 20px rgba(30, 64, 175, 0.5);
-        }
-        
-        .step-completed {
-            background: linear-gradient(135deg, #059669 0%, #10b981 100%);
-            box-shadow: 0 0 20px rgba(5, 150, 105, 0.5);
-        }
-        
-        .step-inactive {
-            background: #e5e7eb;
-            color: #9ca3af;
-        }
-        
-        .fifgroup-icon {
-            background: linear-gradient(135deg, #1e40af 0%, #3b82f6 100%);
-        }
-    </style>
-</head>
-<body class="gradient-bg min-h-screen flex items-center justify-center p-4">
-    <div class="glass-effect rounded-2xl shadow-2xl w-full max-w-2xl p-8">
-        <!-- Header with FIFGroup Branding -->
-        <div class="text-center mb-8">
-            <div class="inline-flex items-center justify-center w-20 h-20 fifgroup-icon rounded-full mb-4 shadow-lg">
-                <i class="fas fa-file-excel text-white text-3xl"></i>
-            </div>
-            <h1 class="text-4xl font-bold corporate-header mb-2">Rekon JF Processor</h1>
-            <div class="text-sm text-blue-600 font-semibold mb-2">FIFGroup Finance & Treasury Division</div>
-            <p class="text-gray-600">Upload your TXT files and convert them to structured Excel format</p>
-            <div class="w-16 h-1 fifgroup-gradient mx-auto mt-3 rounded-full"></div>
-        </div>
-
-        <!-- Progress Steps with FIFGroup Styling -->
-        <div class="flex justify-between mb-8">
-            <div class="flex items-center">
-                <div id="step1" class="w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg">1</div>
-                <span class="ml-3 text-sm font-semibold text-gray-700">Upload</span>
-            </div>
-            <div class="flex-1 h-2 mx-4 bg-gray-200 rounded-full">
-                <div id="progress1" class="h-full rounded-full progress-bar w-0"></div>
-            </div>
-            <div class="flex items-center">
-                <div id="step2" class="w-10 h-10 step-inactive rounded-full flex items-center justify-center text-sm font-bold">2</div>
-                <span class="ml-3 text-sm font-medium text-gray-500">Process</span>
-            </div>
-            <div class="flex-1 h-2 mx-4 bg-gray-200 rounded-full">
-                <div id="progress2" class="h-full rounded-full progress-bar w-0"></div>
-            </div>
-            <div class="flex items-center">
-                <div id="step3" class="w-10 h-10 step-inactive rounded-full flex items-center justify-center text-sm font-bold">3</div>
-                <span class="ml-3 text-sm font-medium text-gray-500">Download</span>
-            </div>
-        </div>
-
-        <!-- File Upload Area with Enhanced Styling -->
-        <div id="uploadArea" class="file-drop-zone rounded-xl p-8 text-center mb-6 shadow-inner">
-            <input type="file" id="fileInput" multiple accept=".txt" class="hidden">
-            <div class="mb-4">
-                <i class="fas fa-cloud-upload-alt text-5xl text-blue-500 mb-4"></i>
-                <p class="text-xl font-semibold text-gray-700 mb-2">Drop your TXT files here</p>
-                <p class="text-sm text-gray-500 mb-6">or click to browse • Maximum 50 files, 16MB each</p>
-                <button onclick="document.getElementById('fileInput').click()" 
-                        class="fifgroup-btn-primary text-white px-8 py-3 rounded-lg font-semibold shadow-lg disabled:opacity-50 disabled:cursor-not-allowed">
-                    <i class="fas fa-folder-open mr-2"></i>
-                    Choose Files
-                </button>
-            </div>
-        </div>
-
-        <!-- Selected Files with Enhanced Design -->
-        <div id="filesList" class="hidden mb-6">
-            <h3 class="text-lg font-bold text-gray-800 mb-4 flex items-center">
-                <i class="fas fa-list-ul text-blue-600 mr-2"></i>
-                Selected Files
-            </h3>
-            <div id="filesContainer" class="space-y-3 max-h-40 overflow-y-auto"></div>
-        </div>
-
-        <!-- Action Buttons with FIFGroup Styling -->
-        <div class="space-y-4">
-            <button id="uploadBtn" onclick="uploadFiles()" class="w-full fifgroup-btn-primary text-white py-4 px-6 rounded-xl font-semibold shadow-lg disabled:opacity-50 disabled:cursor-not-allowed disabled:transform-none">
-                <i class="fas fa-upload mr-3"></i>
-                Upload Files
-            </button>
-            
-            <button id="processBtn" onclick="processFiles()" disabled 
-                    class="w-full fifgroup-btn-process text-white py-4 px-6 rounded-xl font-semibold shadow-lg disabled:opacity-50 disabled:cursor-not-allowed disabled:transform-none">
-                <i class="fas fa-cogs mr-3"></i>
-                Process Files
-            </button>
-            
-            <button id="downloadBtn" onclick="downloadFile()" disabled 
-                    class="w-full fifgroup-btn-download text-white py-4 px-6 rounded-xl font-semibold shadow-lg disabled:opacity-50 disabled:cursor-not-allowed disabled:transform-none">
-                <i class="fas fa-download mr-3"></i>
-                Download Excel
-            </button>
-        </div>
-
-        <!-- Status Area with Enhanced Design -->
-        <div id="statusArea" class="mt-8">
-            <div id="status" class="text-center text-gray-600 font-medium"></div>
-            <div id="loadingSpinner" class="hidden flex justify-center items-center mt-4">
-                <div class="animate-spin rounded-full h-10 w-10 border-b-2 border-blue-600"></div>
-                <span class="ml-3 text-gray-700 font-medium">Processing...</span>
-            </div>
-        </div>
-
-        <!-- Success Message with FIFGroup Styling -->
-        <div id="successMessage" class="hidden mt-6 p-4 bg-gradient-to-r from-green-50 to-emerald-50 border border-green-200 text-green-800 rounded-xl shadow-sm">
-            <div class="flex items-center">
-                <i class="fas fa-check-circle success-checkmark mr-3 text-green-600"></i>
-                <span class="font-semibold">Files processed successfully! Ready to download.</span>
-            </div>
-        </div>
-        
-        <!-- Error Details with Enhanced Styling -->
-        <div id="errorDetails" class="hidden mt-6 p-4 bg-gradient-to-r from-red-50 to-pink-50 border border-red-200 text-red-800 rounded-xl shadow-sm">
-            <div class="flex items-center mb-2">
-                <i class="fas fa-exclamation-triangle mr-3 text-red-600"></i>
-                <span class="font-semibold">Error Details:</span>
-            </div>
-            <div id="errorMessage" class="text-sm pl-6"></div>
-        </div>
-        
-        <!-- Footer with Company Info -->
-        <div class="mt-8 pt-6 border-t border-gray-200 text-center">
-            <p class="text-xs text-gray-500">
-                <i class="fas fa-shield-alt mr-1"></i>
-                Powered by FIFGroup Member of ASTRA
-            </p>
-        </div>
-    </div>
-
-    <script>
-        let selectedFiles = [];
-        
-        // File input change handler
-        document.getElementById('fileInput').addEventListener('change', function(e) {
-            handleFiles(e.target.files);
-        });
+# --- Shared state ----------------------------------------------------------------
+# The Flask session only carries ids (batch_id, job_id).  Job and chunked-upload
+# records live in `state_store` and batches of files in `blob_store`, so any
+# worker process -- or any host behind a load balancer -- can serve any step.
 
-        // Drag and drop handlers
-        const uploadArea = document.getElementById('uploadArea');
-        
-        uploadArea.addEventListener('dragover', function(e) {
-            e.preventDefault();
-            uploadArea.classList.add('dragover');
-        });
-        
-        uploadArea.addEventListener('dragleave', function(e) {
-            e.preventDefault();
-            uploadArea.classList.remove('dragover');
-        });
-        
-        uploadArea.addEventListener('drop', function(e) {
-            e.preventDefault();
-            uploadArea.classList.remove('dragover');
-            handleFiles(e.dataTransfer.files);
-        });
-
-        function handleFiles(files) {
-            selectedFiles = Array.from(files).filter(file => file.name.endsWith('.txt'));
-            displaySelectedFiles();
-            
-            const uploadBtn = document.getElementById('uploadBtn');
-            uploadBtn.disabled = selectedFiles.length === 0;
-            
-            if (selectedFiles.length === 0) {
-                showStatus('Please select at least one TXT file.', 'error');
-            } else {
-                showStatus(`${selectedFiles.length} file(s) selected`, 'info');
-            }
-        }
+class StateStore:
+    """Job and chunked-upload records shared by every process serving the app.
 
-        function displaySelectedFiles() {
-            const filesList = document.getElementById('filesList');
-            const filesContainer = document.getElementById('filesContainer');
-            
-            if (selectedFiles.length === 0) {
-                filesList.classList.add('hidden');
-                return;
-            }
-            
-            filesList.classList.remove('hidden');
-            filesContainer.innerHTML = '';
-            
-            selectedFiles.forEach((file, index) => {
-                const fileItem = document.createElement('div');
-                fileItem.className = 'file-item flex items-center justify-between p-4 rounded-xl shadow-sm border';
-                fileItem.innerHTML = `
-                    <div class="flex items-center">
-                        <i class="fas fa-file-alt text-blue-600 mr-4 text-lg"></i>
-                        <div>
-                            <p class="font-semibold text-gray-800">${file.name}</p>
-                            <p class="text-sm text-gray-500">${formatFileSize(file.size)}</p>
-                        </div>
-                    </div>
-                    <button onclick="removeFile(${index})" class="text-red-500 hover:text-red-700 p-2 rounded-lg hover:bg-red-50 transition-colors">
-                        <i class="fas fa-times"></i>
-                    </button>
-                `;
-                filesContainer.appendChild(fileItem);
-            });
-        }
+    Records are plain dicts.  Assign a subclass to `state_store` to keep them
+    in another service; SQLiteStateStore needs nothing beyond a local file.
+    """
 
-        function removeFile(index) {
-            selectedFiles.splice(index, 1);
-            displaySelectedFiles();
-            
-            const uploadBtn = document.getElementById('uploadBtn');
-            uploadBtn.disabled = selectedFiles.length === 0;
-            
-            if (selectedFiles.length === 0) {
-                showStatus('No files selected', 'info');
-            } else {
-                showStatus(`${selectedFiles.length} file(s) selected`, 'info');
+    def create_job(self, job):
+        raise NotImplementedError
+
+    def admit_job(self, job, limit, client_limit):
+        """Create the job unless the backlog is full, as one atomic step.
+
+        The backlog is full when `limit` jobs are queued or running, or
+        `client_limit` of them have job['client_id'].  Returns (admitted,
+        load); load counts the 'active', 'running' and 'client' jobs before
+        this one and gives the mean 'duration' of recently finished jobs
+        (None when there are none).
+        """
+        raise NotImplementedError
+
+    def claim_job(self):
+        """Mark the oldest queued job running and return it, or None if none is queued.
+
+        Atomic across processes: each queued job is handed to one caller.
+        """
+        raise NotImplementedError
+
+    def queue_position(self, job_id):
+        """1-based place of a queued job among all queued jobs, oldest first, or None."""
+        raise NotImplementedError
+
+    def get_job(self, job_id):
+        """The job dict plus 'updated_at', or None."""
+        raise NotImplementedError
+
+    def update_job(self, job_id, **fields):
+        raise NotImplementedError
+
+    def delete_job(self, job_id):
+        raise NotImplementedError
+
+    def create_upload(self, upload):
+        raise NotImplementedError
+
+    def get_upload(self, upload_id):
+        """The upload dict with its 'received' byte count, or None."""
+        raise NotImplementedError
+
+    def advance_upload(self, upload_id, offset, length):
+        """Move 'received' from offset to offset + length; False if it is not at offset."""
+        raise NotImplementedError
+
+    def delete_upload(self, upload_id):
+        """Remove the record; False if another request already did."""
+        raise NotImplementedError
+
+    def busy_batches(self):
+        """Context manager yielding the ids of batches with a queued or running job.
+
+        No job can be created until the block exits, so a batch that is not
+        busy can be deleted inside it without pulling files from under a job.
+        """
+        raise NotImplementedError
+
+
+class SQLiteStateStore(StateStore):
+    """StateStore in one SQLite file (WAL), shared by the processes on a host."""
+
+    def __init__(self, db_path, retention=STATE_RETENTION_SECONDS):
+        self.db_path = db_path
+        self.retention = retention
+        self._db = LocalSQLite(db_path, [
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "upload_id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+            "received INTEGER NOT NULL, updated_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (json_extract(data, '$.status'))",
+        ])
+
+    def _prune(self, db):
+        cutoff = time.time() - self.retention
+        db.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+        db.execute("DELETE FROM uploads WHERE updated_at < ?", (cutoff,))
+
+    @staticmethod
+    def _active_jobs(db):
+        """Queued jobs, however old, and running jobs with a recent heartbeat (see get_job)."""
+        rows = db.execute(
+            "SELECT data, updated_at FROM jobs WHERE json_extract(data, '$.status') IN ('queued', 'running')"
+        )
+        cutoff = time.time() - JOB_STALE_SECONDS
+        jobs = [dict(json.loads(data), updated_at=updated_at) for data, updated_at in rows]
+        return [job for job in jobs if job['status'] == 'queued' or job['updated_at'] >= cutoff]
+
+    @staticmethod
+    def _recent_durations(db):
+        """Run times of the jobs finished within JOB_DURATION_WINDOW."""
+        rows = db.execute(
+            "SELECT data FROM jobs WHERE updated_at >= ? AND json_extract(data, '$.status') = 'done'",
+            (time.time() - JOB_DURATION_WINDOW,),
+        )
+        jobs = [json.loads(row[0]) for row in rows]
+        return [job['finished_at'] - job['started_at'] for job in jobs
+                if job.get('started_at') and job.get('finished_at')]
+
+    def create_job(self, job):
+        with self._db.connect() as db:
+            self._prune(db)
+            db.execute("INSERT INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+                       (job['job_id'], json.dumps(job), time.time()))
+
+    def admit_job(self, job, limit, client_limit):
+        db = self._db.connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            active = self._active_jobs(db)
+            durations = self._recent_durations(db)
+            load = {
+                'active': len(active),
+                'running': sum(j['status'] == 'running' for j in active),
+                'client': sum(j.get('client_id') == job['client_id'] for j in active),
+                'duration': sum(durations) / len(durations) if durations else None,
             }
-        }
+            admitted = load['active'] < limit and load['client'] < client_limit
+            if admitted:
+                self._prune(db)
+                db.execute("INSERT INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+                           (job['job_id'], json.dumps(job), time.time()))
+            db.commit()
+            return admitted, load
+        except BaseException:
+            db.rollback()
+            raise
+
+    def claim_job(self):
+        db = self._db.connect()
+        # Idle threads poll this; only take the write lock when there is work
+        if not db.execute("SELECT 1 FROM jobs WHERE json_extract(data, '$.status') = 'queued' LIMIT 1").fetchone():
+            return None
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT data FROM jobs WHERE json_extract(data, '$.status') = 'queued' "
+                "ORDER BY json_extract(data, '$.created_at') LIMIT 1"
+            ).fetchone()
+            job = None
+            if row:
+                job = dict(json.loads(row[0]), status='running', started_at=time.time())
+                db.execute("UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ?",
+                           (json.dumps(job), time.time(), job['job_id']))
+            db.commit()
+            return job
+        except BaseException:
+            db.rollback()
+            raise
+
+    def queue_position(self, job_id):
+        queued = sorted((job['created_at'], job['job_id'])
+                        for job in self._active_jobs(self._db.connect()) if job['status'] == 'queued')
+        ids = [queued_id for _, queued_id in queued]
+        return ids.index(job_id) + 1 if job_id in ids else None
+
+    def get_job(self, job_id):
+        row = self._db.connect().execute(
+            "SELECT data, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return dict(json.loads(row[0]), updated_at=row[1]) if row else None
+
+    def update_job(self, job_id, **fields):
+        db = self._db.connect()
+        # Read-modify-write under the write lock so concurrent updates don't interleave
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row:
+                db.execute("UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ?",
+                           (json.dumps(dict(json.loads(row[0]), **fields)), time.time(), job_id))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def delete_job(self, job_id):
+        with self._db.connect() as db:
+            db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def create_upload(self, upload):
+        with self._db.connect() as db:
+            self._prune(db)
+            db.execute("INSERT INTO uploads (upload_id, data, received, updated_at) VALUES (?, ?, 0, ?)",
+                       (upload['upload_id'], json.dumps(upload), time.time()))
+
+    def get_upload(self, upload_id):
+        row = self._db.connect().execute(
+            "SELECT data, received FROM uploads WHERE upload_id = ?", (upload_id,)
+        ).fetchone()
+        return dict(json.loads(row[0]), received=row[1]) if row else None
+
+    def advance_upload(self, upload_id, offset, length):
+        with self._db.connect() as db:
+            cursor = db.execute(
+                "UPDATE uploads SET received = received + ?, updated_at = ? "
+                "WHERE upload_id = ? AND received = ?",
+                (length, time.time(), upload_id, offset),
+            )
+            return cursor.rowcount == 1
 
-        function formatFileSize(bytes) {
-            if (bytes === 0) return '0 Bytes';
-            const k = 1024;
-            const sizes = ['Bytes', 'KB', 'MB', 'GB'];
-            const i = Math.floor(Math.log(bytes) / Math.log(k));
-            return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
-        }
+    def delete_upload(self, upload_id):
+        with self._db.connect() as db:
+            return db.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,)).rowcount == 1
 
-        function updateStep(step, completed = false) {
-            const stepElement = document.getElementById(`step${step}`);
-            const progressElement = document.getElementById(`progress${step}`);
-            
-            if (completed) {
-                stepElement.className = 'w-10 h-10 step-completed rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
-                stepElement.innerHTML = '<i class="fas fa-check"></i>';
-                if (progressElement) {
-                    progressElement.style.width = '100%';
-                }
-            } else {
-                stepElement.className = 'w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
-                stepElement.textContent = step;
-            }
-            
-            // Update next step to active if current is completed
-            if (completed && step < 3) {
-                const nextStep = document.getElementById(`step${step + 1}`);
-                nextStep.className = 'w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
-                nextStep.textContent = step + 1;
-            }
-        }
+    @contextmanager
+    def busy_batches(self):
+        db = self._db.connect()
+        # The write lock blocks create_job (and update_job) for the duration
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield {job['batch_id'] for job in self._active_jobs(db)}
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
 
-        function showStatus(message, type = 'info') {
-            const status = document.getElementById('status');
-            const errorDetails = document.getElementById('errorDetails');
-            
-            const colors = {
-                'info': 'text-blue-700 font-medium',
-                'success': 'text-green-700 font-semibold',
-                'error': 'text-red-700 font-semibold',
-                'warning': 'text-amber-700 font-semibold'
-            };
-            
-            status.className = `text-center ${colors[type] || colors.info}`;
-            status.textContent = message;
-            
-            // Hide error details for non-error messages
-            if (type !== 'error') {
-                errorDetails.classList.add('hidden');
-            }
-        }
 
-        function showError(message, details = null) {
-            showStatus(message, 'error');
-            
-            if (details) {
-                const errorDetails = document.getElementById('errorDetails');
-                const errorMessage = document.getElementById('errorMessage');
-                errorMessage.textContent = details;
-                errorDetails.classList.remove('hidden');
-            }
-        }
+class BlobStore:
+    """Where each batch's uploaded files, parse results and outputs live.
 
-        function showLoading(show = true) {
-            const spinner = document.getElementById('loadingSpinner');
-            if (show) {
-                spinner.classList.remove('hidden');
-            } else {
-                spinner.classList.add('hidden');
-            }
-        }
+    Batches are addressed by id.  `batch_path` hands back a local directory
+    for the batch; a store backed by a remote service would sync it there.
+    """
 
-        async function uploadFiles() {
-            if (selectedFiles.length === 0) {
-                showStatus('Please select at least one TXT file.', 'error');
-                return;
-            }
+    def new_batch(self):
+        """Create an empty batch and return its id."""
+        raise NotImplementedError
 
-            const uploadBtn = document.getElementById('uploadBtn');
-            const processBtn = document.getElementById('processBtn');
-            
-            uploadBtn.disabled = true;
-            showLoading(true);
-            showStatus('Uploading files...', 'info');
-
-            const formData = new FormData();
-            selectedFiles.forEach(file => {
-                formData.append('files', file);
-            });
-
-            try {
-                const response = await fetch('/upload', {
-                    method: 'POST',
-                    body: formData
-                });
-                const result = await response.json();
-
-                showLoading(false);
-
-                if (response.ok) {
-                    updateStep(1, true);
-                    updateStep(2, false);
-                    showStatus(result.message, 'success');
-                    processBtn.disabled = false;
-                } else {
-                    showError(`Upload failed: ${result.error}`);
-                    uploadBtn.disabled = false;
-                }
-            } catch (error) {
-                showLoading(false);
-                showError('Network error during upload', error.message);
-                uploadBtn.disabled = false;
-            }
-        }
+    def batch_path(self, batch_id):
+        """Local directory holding the batch, or None if it does not exist."""
+        raise NotImplementedError
 
-        async function processFiles() {
-            const processBtn = document.getElementById('processBtn');
-            const downloadBtn = document.getElementById('downloadBtn');
-            
-            processBtn.disabled = true;
-            showLoading(true);
-            showStatus('Processing files...', 'info');
-
-            try {
-                const response = await fetch('/process', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    }
-                });
-                
-                const result = await response.json();
-                showLoading(false);
-
-                if (response.ok) {
-                    updateStep(2, true);
-                    updateStep(3, false);
-                    showStatus(result.message, 'success');
-                    downloadBtn.disabled = false;
-                    document.getElementById('successMessage').classList.remove('hidden');
-                } else {
-                    showError(`Processing failed: ${result.error}`);
-                    processBtn.disabled = false;
-                }
-            } catch (error) {
-                showLoading(false);
-                showError('Network error during processing', error.message);
-                processBtn.disabled = false;
-            }
-        }
+    def delete_batch(self, batch_id):
+        raise NotImplementedError
 
-        async function downloadFile() {
-            const downloadBtn = document.getElementById('downloadBtn');
-            const uploadBtn = document.getElementById('uploadBtn');
-            
-            downloadBtn.disabled = true;
-            showLoading(true);
-            showStatus('Preparing download...', 'info');
-
-            try {
-                const response = await fetch('/download');
-                if (response.ok) {
-                    const blob = await response.blob();
-                    const url = window.URL.createObjectURL(blob);
-                    const a = document.createElement('a');
-                    a.href = url;
-                    a.download = 'rekon_jf.xlsx';
-                    document.body.appendChild(a);
-                    a.click();
-                    a.remove();
-                    window.URL.revokeObjectURL(url);
-
-                    showLoading(false);
-                    updateStep(3, true);
-                    showStatus('File downloaded successfully! Ready for new files.', 'success');
-                    
-                    // Reset for new upload
-                    setTimeout(() => {
-                        resetForm();
-                    }, 2000);
-                } else {
-                    const result = await response.json();
-                    showLoading(false);
-                    showError(`Download failed: ${result.error}`);
-                    downloadBtn.disabled = false;
-                }
-            } catch (error) {
-                showLoading(false);
-                showError('Network error during download', error.message);
-                downloadBtn.disabled = false;
-            }
-        }
+    def list_batches(self):
+        """Ids of every batch in the store."""
+        raise NotImplementedError
 
-        function resetForm() {
-            // Reset file selection
-            selectedFiles = [];
-            document.getElementById('fileInput').value = '';
-            document.getElementById('filesList').classList.add('hidden');
-            
-            // Reset buttons
-            document.getElementById('uploadBtn').disabled = false;
-            document.getElementById('processBtn').disabled = true;
-            document.getElementById('downloadBtn').disabled = true;
-            
-            // Reset steps with FIFGroup styling
-            document.getElementById('step1').className = 'w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
-            document.getElementById('step1').textContent = '1';
-            document.getElementById('step2').className = 'w-10 h-10 step-inactive rounded-full flex items-center justify-center text-sm font-bold';
-            document.getElementById('step2').textContent = '2';
-            document.getElementById('step3').className = 'w-10 h-10 step-inactive rounded-full flex items-center justify-center text-sm font-bold';
-            document.getElementById('step3').textContent = '3';
-            
-            // Reset progress bars
-            document.getElementById('progress1').style.width = '0%';
-            document.getElementById('progress2').style.width = '0%';
-            
-            // Hide messages
-            document.getElementById('successMessage').classList.add('hidden');
-            document.getElementById('errorDetails').classList.add('hidden');
-            
-            // Reset status
-            showStatus('Select TXT files to get started', 'info');
-        }
+    def batch_usage(self, batch_id):
+        """(last modified timestamp, bytes) of a batch, or None if it does not exist."""
+        raise NotImplementedError
 
-        // Initialize
-        showStatus('Select TXT files to get started', 'info');
-    </script>
-</body>
-</html>'''
+    def retire_batch(self, batch_id):
+        """Make a batch disappear at once, leaving its contents for purge_retired.
+
+        Cheap enough to run under StateStore.busy_batches.  Returns False if
+        the batch was already gone.
+        """
+        raise NotImplementedError
+
+    def purge_retired(self):
+        """Delete the contents of retired batches; returns how many were purged."""
+        raise NotImplementedError
+
+
+class FilesystemBlobStore(BlobStore):
+    """Batches as uuid-named folders under `root`.
+
+    Several workers on one host share it as is; several hosts need `root`
+    on a shared mount (REKON_UPLOAD_FOLDER).
+    """
+
+    _BATCH_ID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def new_batch(self):
+        batch_id = str(uuid.uuid4())
+        os.makedirs(os.path.join(self.root, batch_id), exist_ok=True)
+        return batch_id
+
+    def batch_path(self, batch_id):
+        if not batch_id or not self._BATCH_ID_RE.fullmatch(batch_id):
+            return None
+        path = os.path.join(self.root, batch_id)
+        return path if os.path.isdir(path) else None
+
+    def delete_batch(self, batch_id):
+        path = self.batch_path(batch_id)
+        if path:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def list_batches(self):
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return [name for name in names if self._BATCH_ID_RE.fullmatch(name)]
+
+    def retire_batch(self, batch_id):
+        """Rename the folder to a '.trash-' tombstone in the same directory."""
+        path = self.batch_path(batch_id)
+        if path is None:
+            return False
+        try:
+            os.rename(path, os.path.join(self.root, f'.trash-{batch_id}'))
+        except FileNotFoundError:  # Another janitor got there first
+            return False
+        return True
+
+    def purge_retired(self):
+        try:
+            names = [name for name in os.listdir(self.root) if name.startswith('.trash-')]
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        return len(names)
+
+    def batch_usage(self, batch_id):
+        """Newest mtime and total size of the folder and everything in it."""
+        path = self.batch_path(batch_id)
+        if path is None:
+            return None
+        newest, size = 0.0, 0
+        for folder, _, files in os.walk(path):
+            try:
+                newest = max(newest, os.stat(folder).st_mtime)
+            except FileNotFoundError:
+                continue
+            for name in files:
+                try:
+                    st = os.stat(os.path.join(folder, name))
+                except FileNotFoundError:
+                    continue
+                newest, size = max(newest, st.st_mtime), size + st.st_size
+        return (newest, size) if newest else None
+
+state_store = SQLiteStateStore(STATE_DB)
+blob_store = FilesystemBlobStore(UPLOAD_FOLDER)
+
+# --- Reconciliation history ------------------------------------------------------
+# Upload folders come and go; every parsed row is also kept here so treasury
+# can query date ranges and month-over-month trends across years of letters.
+
+def _date_bound(value, upper=False):
+    """'YYYY', 'YYYY-MM' or 'YYYY-MM-DD' as an inclusive bound on ISO statement dates.
+
+    The bound is rebuilt from the parsed date, so '2025-1' compares as '2025-01'.
+    """
+    formats = (('%Y-%m-%d', 10, ('', '')), ('%Y-%m', 7, ('-01', '-99')), ('%Y', 4, ('-01-01', '-99-99')))
+    for fmt, length, pad in formats:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return parsed.date().isoformat()[:length] + pad[upper]
+    raise ValueError(f"Invalid date '{value}'. Use YYYY, YYYY-MM or YYYY-MM-DD")
+
+class HistoryStore:
+    """Every parsed row with its SOFCODE, statement date and content hash.
+
+    One row per statement filename -- a letter sent again replaces the earlier
+    copy -- indexed on (sofcode, statement_date) and statement_date, so range
+    queries and per-period aggregates only touch the rows they return.
+    """
+
+    PERIODS = {'day': 10, 'month': 7, 'year': 4}  # prefix length of the ISO date
+    FIELDS = {col: re.sub(r'\W+', '_', col.lower()) for col in AMOUNT_COLUMNS}
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._db = LocalSQLite(db_path, [
+            "CREATE TABLE IF NOT EXISTS history ("
+            "filename TEXT PRIMARY KEY, sofcode TEXT NOT NULL, statement_date TEXT, "
+            "sha256 TEXT NOT NULL, recorded_at REAL NOT NULL, "
+            + ", ".join(f"{field} INTEGER NOT NULL" for field in self.FIELDS.values()) + ")",
+            "CREATE INDEX IF NOT EXISTS history_sofcode_date ON history (sofcode, statement_date)",
+            "CREATE INDEX IF NOT EXISTS history_date ON history (statement_date)",
+        ])
+
+    def record(self, entries):
+        """Store parse results (parse_jf_text dicts); rows that failed to parse are skipped."""
+        now = time.time()
+        values = [
+            (data['filename'], data['BANK JF/SOFCODE'], extract_date_from_filename(data['filename']),
+             data['sha256'], now, *(int(data[col]) for col in self.FIELDS))
+            for data in entries if 'error' not in data and data.get('sha256')
+        ]
+        columns = "filename, sofcode, statement_date, sha256, recorded_at, " + ", ".join(self.FIELDS.values())
+        with self._db.connect() as db:
+            db.executemany(
+                f"INSERT OR REPLACE INTO history ({columns}) VALUES ({', '.join('?' * (5 + len(self.FIELDS)))})",
+                values,
+            )
+        return len(values)
+
+    def _where(self, start, end, sofcode):
+        clauses, params = [], []
+        if sofcode:
+            clauses.append("sofcode = ?")
+            params.append(sofcode)
+        if start:
+            clauses.append("statement_date >= ?")
+            params.append(_date_bound(start))
+        if end:
+            clauses.append("statement_date <= ?")
+            params.append(_date_bound(end, upper=True))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def rows(self, start=None, end=None, sofcode=None, limit=1000, offset=0):
+        """Stored rows in date order, keyed like COLUMNS."""
+        where, params = self._where(start, end, sofcode)
+        cursor = self._db.connect().execute(
+            "SELECT filename, sofcode, statement_date, sha256, " + ", ".join(self.FIELDS.values())
+            + f" FROM history{where} ORDER BY statement_date, filename LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        keys = ['filename', 'BANK JF/SOFCODE', 'statement_date', 'sha256'] + list(self.FIELDS)
+        return [dict(zip(keys, row)) for row in cursor]
+
+    def aggregate(self, start=None, end=None, sofcode=None, period='month', by_sofcode=False):
+        """Files and summed COLUMNS per period (and SOFCODE), in period order."""
+        length = self.PERIODS[period]
+        where, params = self._where(start, end, sofcode)
+        group = f"substr(statement_date, 1, {length})" + (", sofcode" if by_sofcode else "")
+        cursor = self._db.connect().execute(
+            f"SELECT substr(statement_date, 1, {length})" + (", sofcode" if by_sofcode else "")
+            + ", COUNT(*), " + ", ".join(f"SUM({field})" for field in self.FIELDS.values())
+            + f" FROM history{where} GROUP BY {group} ORDER BY {group}",
+            params,
+        )
+        keys = ['period'] + (['BANK JF/SOFCODE'] if by_sofcode else []) + ['files'] + list(self.FIELDS)
+        return [dict(zip(keys, row)) for row in cursor]
+
+history_store = HistoryStore(HISTORY_DB) if HISTORY_DB else None
+
+def record_history(entries):
+    """Add parse results to history_store; a failure here never fails the run."""
+    if history_store is None:
+        return
+    try:
+        history_store.record(entries)
+    except sqlite3.Error as e:
+        logger.warning(f"Recording history failed: {str(e)}")
+
+def recording_history(results):
+    """Pass (filename, data, error) results through, recording parsed ones as they go.
+
+    Rows are written every HISTORY_CHUNK_ROWS, so a large run never keeps
+    all of its parse results just to record them at the end.
+    """
+    chunk = []
+    try:
+        for filename, data, error in results:
+            if error is None and history_store is not None:
+                chunk.append(data)
+                if len(chunk) >= HISTORY_CHUNK_ROWS:
+                    record_history(chunk)
+                    chunk = []
+            yield filename, data, error
+    finally:
+        if chunk:
+            record_history(chunk)
+
+# --- Background jobs -------------------------------------------------------------
+# /process enqueues a job and returns at once; the browser polls /jobs/<id>.
+# Each serving process runs JOB_WORKERS threads that claim queued jobs from
+# state_store, so a job is not tied to the worker that accepted it: any
+# process can run it, and status and downloads can be served by any worker.
+
+_jobs_queued = threading.Event()  # Wakes this process's job threads early
+_profile_lock = threading.Lock()  # cProfile allows one active profiler per process
+_job_runners_lock = threading.Lock()
+_job_runners_pid = None
+
+class JobRejected(Exception):
+    """The backlog is full; carries estimates for the 429 answer."""
+
+    def __init__(self, message, retry_after, position):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.position = position
+
+def _backlog_estimate(load, own_job):
+    """(seconds until a job could be admitted, place in the queue) for a rejected job.
+
+    Jobs are assumed to take the recent mean duration (30 s without history)
+    and to finish `running` at a time.
+    """
+    duration = load['duration'] or 30.0
+    position = load['active'] - load['running'] + 1
+    ahead = 1 if own_job else load['active'] - MAX_ACTIVE_JOBS + 1
+    slots = max(load['running'], 1)
+    wait = duration * ((ahead + slots - 1) // slots)
+    return int(min(max(wait, 1), 600)), position
+
+def _admit(job):
+    """Store `job` if the backlog has room, else raise JobRejected.
+
+    The backlog is full when MAX_ACTIVE_JOBS jobs are queued or running, or
+    MAX_JOBS_PER_CLIENT of them belong to job['client_id'].
+    """
+    client_limit = MAX_JOBS_PER_CLIENT if job['client_id'] else MAX_ACTIVE_JOBS
+    admitted, load = state_store.admit_job(job, MAX_ACTIVE_JOBS, client_limit)
+    if not admitted:
+        own_job = load['active'] < MAX_ACTIVE_JOBS
+        retry_after, position = _backlog_estimate(load, own_job)
+        message = ('You already have a job in progress' if own_job
+                   else 'The server is busy processing other batches')
+        raise JobRejected(message, retry_after, position)
+
+def submit_job(batch_id, fmt='xlsx', profile=False, client_id=None):
+    """Queue process_files for a batch and return the job id.
+
+    Raises JobRejected when the backlog is full (see _admit).
+    """
+    job_id = str(uuid.uuid4())
+    _admit({
+        'job_id': job_id,
+        'status': 'queued',
+        'processed': 0,
+        'total': 0,
+        'message': None,
+        'batch_id': batch_id,
+        'client_id': client_id,
+        'created_at': time.time(),
+        'output': f'rekon_jf.{EXPORT_FORMATS[fmt][1]}',
+        'format': fmt,
+        'profile': profile,
+        'profile_name': None,
+    })
+    start_job_runners()
+    _jobs_queued.set()
+    return job_id
+
+@contextmanager
+def work_slot(client_id=None, batch_id=None):
+    """Hold a backlog slot while a request parses or exports in its own thread.
+
+    The slot is a running job record, so synchronous work counts against
+    MAX_ACTIVE_JOBS like queued jobs do, and `batch_id` is busy for the
+    janitor meanwhile.  Raises JobRejected when the backlog is full.
+    """
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    _admit({
+        'job_id': job_id,
+        'status': 'running',
+        'batch_id': batch_id,
+        'client_id': client_id,
+        'created_at': now,
+        'started_at': now,
+    })
+    try:
+        with job_heartbeat(job_id):
+            yield
+    finally:
+        discard_job(job_id)
+
+def busy_response(e):
+    """429 answer for a JobRejected, with Retry-After."""
+    logger.info(f"Request rejected: {str(e)} (position {e.position}, retry in {e.retry_after}s)")
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after, 'position': e.position})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+def get_job(job_id):
+    """Return a snapshot of a job, or None if it is unknown.
+
+    A running job whose heartbeat stopped (its worker was restarted) is
+    returned as an error so clients stop waiting for it.  A queued job is
+    never stale: it is only waiting for a free worker.
+    """
+    job = state_store.get_job(job_id)
+    if (job and job['status'] == 'running'
+            and time.time() - job['updated_at'] > JOB_STALE_SECONDS):
+        job.update(status='error', message='Processing was interrupted. Please process the files again.')
+    return job
+
+def _update_job(job_id, **fields):
+    state_store.update_job(job_id, **fields)
+
+def discard_job(job_id):
+    state_store.delete_job(job_id)
+
+@contextmanager
+def job_heartbeat(job_id):
+    """Touch the job record every JOB_HEARTBEAT_SECONDS while the block runs.
+
+    Progress reports stop after parsing, so without this a long export
+    would look like a dead worker to get_job.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                _update_job(job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Job {job_id} heartbeat failed: {str(e)}")
+
+    thread = threading.Thread(target=beat, name="rekon-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def _job_runner_loop():
+    while True:
+        try:
+            job = state_store.claim_job()
+        except sqlite3.Error as e:
+            logger.warning(f"Claiming a job failed: {str(e)}")
+            job = None
+        if job is None:
+            _jobs_queued.wait(JOB_POLL_SECONDS)
+            _jobs_queued.clear()
+            continue
+        JOBS_IN_FLIGHT.inc()
+        try:
+            _execute_job(job)
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} failed to finish: {str(e)}")
+        finally:
+            JOBS_IN_FLIGHT.dec()
+
+def start_job_runners():
+    """Start this process's JOB_WORKERS job threads, once."""
+    global _job_runners_pid
+    if _job_runners_pid == os.getpid():
+        return
+    with _job_runners_lock:
+        if _job_runners_pid != os.getpid():
+            _job_runners_pid = os.getpid()
+            for n in range(JOB_WORKERS):
+                threading.Thread(target=_job_runner_loop, name=f"rekon-job-{n}", daemon=True).start()
+
+def _execute_job(job):
+    """Run a job claimed by state_store.claim_job and record the outcome."""
+    job_id = job['job_id']
+    upload_folder = blob_store.batch_path(job['batch_id'])
+    last_update = [0.0]
+
+    def progress(done, total):
+        # Every update is a state_store write, so report at most a few per second
+        now = time.monotonic()
+        if done in (0, total) or now - last_update[0] >= 0.25:
+            last_update[0] = now
+            _update_job(job_id, processed=done, total=total)
+
+    profiled = job['profile'] and _profile_lock.acquire(blocking=False)
+    if job['profile'] and not profiled:
+        logger.info(f"Job {job_id} runs unprofiled: another job in this process is being profiled")
+    try:
+        with job_heartbeat(job_id):
+            if upload_folder is None:
+                success, message = False, "Uploaded files are no longer available"
+            elif profiled:
+                # Parse in this thread so regex time shows up next to openpyxl and I/O
+                profiler = cProfile.Profile()
+                success, message = profiler.runcall(
+                    process_files, upload_folder, os.path.join(upload_folder, job['output']),
+                    workers=1, progress=progress, fmt=job['format'],
+                )
+                _update_job(job_id, profile_name=save_profile(profiler, job_id))
+            else:
+                success, message = process_files(
+                    upload_folder, os.path.join(upload_folder, job['output']),
+                    progress=progress, fmt=job['format'],
+                )
+    except Exception as e:
+        logger.error(f"Job {job_id} crashed: {str(e)}")
+        success, message = False, f"Processing error: {str(e)}"
+    finally:
+        if profiled:
+            _profile_lock.release()
+
+    if success:
+        logger.info(f"Job {job_id} finished: {message}")
+        _update_job(job_id, status='done', message=message, finished_at=time.time())
+    else:
+        blob_store.delete_batch(job['batch_id'])
+        _update_job(job_id, status='error', message=message, finished_at=time.time())
+
+# --- Upload janitor --------------------------------------------------------------
+# Batches are only removed by a failed job or, without KEEP_SESSIONS, after a
+# download, so abandoned sessions would pile up.  Each serving process runs a
+# janitor thread that deletes batches idle for UPLOAD_TTL_SECONDS and, above
+# UPLOAD_QUOTA_BYTES, the least recently touched ones.  Batches with a queued
+# or running job are never touched (see StateStore.busy_batches).
+
+_janitor_lock = threading.Lock()
+_janitor_pid = None
+
+def sweep_uploads(now=None):
+    """One janitor pass over blob_store; returns (batches removed, bytes reclaimed)."""
+    now = time.time() if now is None else now
+    blob_store.purge_retired()  # Left by a janitor that died between retiring and purging
+    usage = {batch_id: blob_store.batch_usage(batch_id) for batch_id in blob_store.list_batches()}
+    batches = sorted((u[0], u[1], batch_id) for batch_id, u in usage.items() if u)  # oldest first
+    total = sum(size for _, size, _ in batches)
+    removed = reclaimed = 0
+
+    for last_modified, size, batch_id in batches:
+        idle = now - last_modified
+        expired = UPLOAD_TTL_SECONDS and idle > UPLOAD_TTL_SECONDS
+        over_quota = UPLOAD_QUOTA_BYTES and total > UPLOAD_QUOTA_BYTES and idle > UPLOAD_GRACE_SECONDS
+        if not (expired or over_quota):
+            continue
+
+        # Skip it if files arrived since it was measured
+        if blob_store.batch_usage(batch_id) != (last_modified, size):
+            continue
+        # Only the job check and a rename happen under the lock; running jobs
+        # need it for their progress updates, so the slow delete waits until after
+        with state_store.busy_batches() as busy:
+            if batch_id in busy or not blob_store.retire_batch(batch_id):
+                continue
+        blob_store.purge_retired()
+
+        total -= size
+        removed += 1
+        reclaimed += size
+        logger.info(f"Janitor removed batch {batch_id} ({size} bytes, idle {idle:.0f}s"
+                    f"{'' if expired else ', over quota'})")
+
+    UPLOAD_BYTES.set(total)
+    BATCHES_SWEPT.inc(removed)
+    BYTES_RECLAIMED.inc(reclaimed)
+    return removed, reclaimed
+
+def _janitor_loop():
+    while True:
+        try:
+            sweep_uploads()
+        except Exception as e:
+            logger.error(f"Upload janitor failed: {str(e)}")
+        time.sleep(JANITOR_INTERVAL)
+
+def start_janitor():
+    """Start this process's janitor thread, once (no-op with JANITOR_INTERVAL = 0)."""
+    global _janitor_pid
+    if not JANITOR_INTERVAL or _janitor_pid == os.getpid():
+        return
+    with _janitor_lock:
+        if _janitor_pid != os.getpid():
+            _janitor_pid = os.getpid()
+            threading.Thread(target=_janitor_loop, name="rekon-janitor", daemon=True).start()
+
+@app.before_request
+def _start_background_threads():
+    start_janitor()
+    start_job_runners()
+
+# --- Uploads ---------------------------------------------------------------------
+
+def ingest_upload(file, upload_folder, parsed):
+    """Store or parse one uploaded TXT file or archive into `upload_folder`.
+
+    Parse results are added to `parsed` ({filename: data}); the caller saves
+    them with save_parsed_rows.  A file uploaded again under the same name
+    replaces the earlier copy, parsed or on disk.  Returns (uploaded
+    filenames, skipped files with the reason).
+    """
+    if is_archive(file.filename):
+        # Parse members as they are read; keep nothing unless the whole
+        # archive passes the limits.
+        members, size, invalid_files = {}, 0, []
+        try:
+            for member, raw, problem in iter_archive(file):
+                filename = secure_filename(member)
+                if problem or not filename:
+                    invalid_files.append(f"{file.filename}/{member} ({problem or 'invalid name'})")
+                elif filename in members:
+                    invalid_files.append(f"{file.filename}/{member} (duplicate)")
+                else:
+                    members[filename] = parse_jf_text(raw, filename)
+                    size += len(raw)
+                    if RETAIN_UPLOADS:
+                        with open(os.path.join(upload_folder, filename), 'wb') as f:
+                            f.write(raw)
+        except ArchiveError as e:
+            if RETAIN_UPLOADS:
+                for filename in members:
+                    os.remove(os.path.join(upload_folder, filename))
+            return [], invalid_files + [f"{file.filename} ({e})"]
+        BYTES_INGESTED.inc(size)
+        if not RETAIN_UPLOADS:
+            for filename in members:
+                _remove_disk_copy(upload_folder, filename)
+        parsed.update(members)
+        return list(members), invalid_files
+
+    # Validate file type
+    if not allowed_file(file.filename):
+        return [], [f"{file.filename} (invalid type)"]
+
+    filename = secure_filename(file.filename)
+    if PARSE_ON_UPLOAD:
+        # Size check and parse straight from the request stream
+        raw = read_upload(file)
+        if raw is None:
+            return [], [f"{file.filename} (too large)"]
+        if not filename:
+            return [], []
+        BYTES_INGESTED.inc(len(raw))
+        parsed[filename] = parse_jf_text(raw, filename)
+        if RETAIN_UPLOADS:
+            with open(os.path.join(upload_folder, filename), 'wb') as f:
+                f.write(raw)
+        else:
+            _remove_disk_copy(upload_folder, filename)
+        return [filename], []
+
+    # Validate file size
+    if not validate_file_size(file):
+        return [], [f"{file.filename} (too large)"]
+    if not filename:  # Ensure filename is not empty after sanitization
+        return [], []
+    file_path = os.path.join(upload_folder, filename)
+    file.save(file_path)
+    BYTES_INGESTED.inc(os.path.getsize(file_path))
+    parsed.pop(filename, None)  # process_files parses the new copy
+    return [filename], []
+
+def _remove_disk_copy(upload_folder, filename):
+    """Drop an earlier on-disk upload that a freshly parsed copy replaces."""
+    path = os.path.join(upload_folder, filename)
+    if os.path.exists(path):
+        os.remove(path)
+
+def session_batch():
+    """(batch_id, local folder) of the session's upload, or (None, None)."""
+    batch_id = session.get('batch_id')
+    upload_folder = blob_store.batch_path(batch_id) if batch_id else None
+    return (batch_id, upload_folder) if upload_folder else (None, None)
+
+def replace_session_batch(batch_id):
+    """Point the session at a new batch and drop the one it replaces.
+
+    The previous batch is kept while a job is still working on it.
+    """
+    previous = session.get('batch_id')
+    job_id = session.get('job_id')
+    job = get_job(job_id) if job_id else None
+    session['batch_id'] = batch_id
+    session.pop('job_id', None)
+    if previous and previous != batch_id and not (job and job['status'] in ('queued', 'running')):
+        blob_store.delete_batch(previous)
+
+def batch_busy(batch_id):
+    """True while a queued or running job reads the batch, so it must not change."""
+    with state_store.busy_batches() as busy:
+        return batch_id in busy
+
+def upload_slot(batch_id, filenames):
+    """work_slot for an upload that parses in the request, else a no-op.
+
+    Archive members are always parsed on arrival, plain TXT files only with
+    PARSE_ON_UPLOAD.  Raises JobRejected when the backlog is full.
+    """
+    if not (PARSE_ON_UPLOAD or any(is_archive(name) for name in filenames)):
+        return nullcontext()
+    return work_slot(session.setdefault('client_id', str(uuid.uuid4())), batch_id)
+
+# --- Chunked uploads -------------------------------------------------------------
+# For batches too large or connections too flaky for one multipart POST:
+#   POST /uploads                  start: {filename, size, sha256?, append?}
+#   GET  /uploads/<id>             current offset, to resume after a disconnect
+#   PUT  /uploads/<id>?offset=N    raw chunk body, optional X-Chunk-SHA256
+#   POST /uploads/<id>/finalize    ingest the file like /upload does
+# Partial data lives in <batch folder>/.chunks and the received offset in
+# state_store, so an interrupted upload can be resumed on any worker for as
+# long as the session's batch exists.
+
+def chunk_path(upload_folder, upload_id):
+    """Partial data file of a chunked upload."""
+    return os.path.join(upload_folder, CHUNKS_DIR, upload_id + '.part')
+
+def find_chunked_upload(upload_id):
+    """Return (upload_folder, record) for an upload of this session, or (None, None)."""
+    batch_id, upload_folder = session_batch()
+    upload = state_store.get_upload(upload_id) if upload_folder else None
+    if not upload or upload['batch_id'] != batch_id:
+        return None, None
+    return upload_folder, upload
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in UPLOAD_CHUNK_SIZE blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# --- Parse API -------------------------------------------------------------------
+# POST /api/v1/parse parses the files in the request and streams their rows
+# back.  No session, no upload folder: the body is read in blocks and only the
+# file being parsed is held in memory, so any worker can serve any call and
+# integrations can run many in parallel.
+
+API_FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+
+def _size_limit(filename):
+    return API_ARCHIVE_MAX_BYTES if is_archive(filename) else MAX_FILE_SIZE
+
+def _iter_multipart(stream, boundary, block_size=64 * 1024):
+    """Yield (filename, raw, problem) for each file part of a multipart body as it completes.
+
+    raw is None when the part is over its size limit (see _size_limit).  Form
+    fields and empty file inputs are skipped.  Raises ValueError when the
+    body is not valid multipart.
+    """
+    decoder = MultipartDecoder(boundary.encode())
+    part, chunks, size = None, [], 0
+    while True:
+        block = stream.read(block_size)
+        decoder.receive_data(block or None)
+        event = decoder.next_event()
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File):
+                part, chunks, size = event, [], 0
+            elif isinstance(event, Data) and part is not None:
+                size += len(event.data)
+                if size <= _size_limit(part.filename):
+                    chunks.append(event.data)
+                if not event.more_data:
+                    if size > _size_limit(part.filename):
+                        yield part.filename, None, 'too large'
+                    elif part.filename:
+                        yield part.filename, b"".join(chunks), None
+                    part, chunks = None, []
+            else:
+                part = None  # a plain form field
+            event = decoder.next_event()
+        if isinstance(event, Epilogue):
+            return
+        if not block:
+            raise ValueError("unexpected end of multipart body")
+
+def iter_request_files():
+    """Yield (filename, raw, problem) for every file in a /api/v1/parse body.
+
+    A multipart body may carry any number of files; any other body is one
+    file named by ?filename= (or X-Filename).  Archives are expanded member by
+    member.  raw is None when the file is skipped and problem says why.
+    """
+    if request.mimetype == 'multipart/form-data':
+        files = _iter_multipart(request.stream, request.mimetype_params['boundary'])
+    else:
+        name = request.args.get('filename') or request.headers.get('X-Filename') or 'upload.txt'
+        raw = request.stream.read(_size_limit(name) + 1)
+        problem = 'empty' if not raw else 'too large' if len(raw) > _size_limit(name) else None
+        files = [(name, None if problem else raw, problem)]
+
+    for name, raw, problem in files:
+        if raw is None:
+            yield name, None, problem
+        elif is_archive(name):
+            try:
+                for member, member_raw, member_problem in iter_archive(FileStorage(io.BytesIO(raw), name)):
+                    yield member, member_raw, member_problem
+            except ArchiveError as e:
+                yield name, None, str(e)
+        elif allowed_file(name):
+            yield name, raw, None
+        else:
+            yield name, None, 'invalid type'
+
+def iter_api_rows(files):
+    """Parse (filename, raw, problem) files into API entries, one per file.
+
+    Parsed files become numbered COLUMNS rows plus their filename (and the
+    parser's error, if any); skipped files become {filename, error}.
+    """
+    number = 0
+    for name, raw, problem in files:
+        if raw is None:
+            FILES_ERRORED.inc()
+            yield {'filename': name, 'error': problem}
+            continue
+        BYTES_INGESTED.inc(len(raw))
+        data = parse_jf_text(raw, name)
+        number += 1
+        row = {'NO': number, **{col: data[col] for col in COLUMNS[1:]}, 'filename': name}
+        if 'error' in data:
+            FILES_ERRORED.inc()
+            row['error'] = data['error']
+        FILES_PROCESSED.inc()
+        yield row
+
+# --- Profiling -------------------------------------------------------------------
+# Opt-in only: a job is profiled when PROFILE_ALL_JOBS is set or /process is
+# called with an X-Rekon-Profile header by an admin.  Nothing runs otherwise.
+
+def is_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def save_profile(profiler, job_id):
+    """Dump a job profile into PROFILE_FOLDER, keeping the newest PROFILE_KEEP."""
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id}.prof"
+    profiler.dump_stats(os.path.join(PROFILE_FOLDER, name))
+
+    profiles = sorted(f for f in os.listdir(PROFILE_FOLDER) if f.endswith('.prof'))
+    for old in profiles[:-PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(PROFILE_FOLDER, old))
+        except OSError as e:
+            logger.warning(f"Could not remove old profile {old}: {str(e)}")
+
+    logger.info(f"Profile saved: {name}")
+    return name
+
+# --- UI assets -------------------------------------------------------------------
+# The page, CSS and JS in ASSET_FOLDER are minified, content-hashed and
+# compressed once per process.  Hashed files are cached by browsers for
+# ASSET_MAX_AGE; the page itself is revalidated on every visit via its ETag.
+
+ASSET_TYPES = {'.css': 'text/css', '.js': 'text/javascript', '.html': 'text/html'}
+
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE_RE = re.compile(r"\s*([{};:,>])\s*")
+_HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+
+def minify_css(text):
+    text = re.sub(r"\s+", " ", _CSS_COMMENT_RE.sub("", text))
+    return _CSS_SPACE_RE.sub(r"\1", text).replace(";}", "}").strip()
+
+def minify_lines(text):
+    """Strip indentation, blank lines and whole-line // comments (JS and HTML).
+
+    Line breaks are kept, so JavaScript's automatic semicolons still apply.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+def make_asset(body, mimetype):
+    """Asset record: identity, gzip and (with brotli installed) br bodies plus an ETag."""
+    body = body.encode('utf-8')
+    variants = {'identity': body}
+    compressed = {'gzip': gzip.compress(body, 9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(body)
+    variants.update((enc, data) for enc, data in compressed.items() if len(data) < len(body))
+    return {'mimetype': mimetype, 'etag': hashlib.sha256(body).hexdigest()[:16], 'variants': variants}
+
+@lru_cache(maxsize=None)
+def get_assets():
+    """Build the UI once: {'files': {hashed name: asset}, 'index': asset}.
+
+    app.css and app.js are served as e.g. /assets/app.<hash>.css, so a new
+    build always gets new URLs; index.html is rendered with those URLs.
+    """
+    files, urls = {}, {}
+    for name, minify in (('app.css', minify_css), ('app.js', minify_lines)):
+        with open(os.path.join(ASSET_FOLDER, name), encoding='utf-8') as f:
+            stem, ext = os.path.splitext(name)
+            asset = make_asset(minify(f.read()), ASSET_TYPES[ext])
+        hashed = f"{stem}.{asset['etag'][:12]}{ext}"
+        files[hashed], urls[name] = asset, f"/assets/{hashed}"
+
+    with open(os.path.join(ASSET_FOLDER, 'index.html'), encoding='utf-8') as f:
+        page = app.jinja_env.from_string(f.read()).render(assets=urls)
+    index = make_asset(minify_lines(_HTML_COMMENT_RE.sub("", page)), ASSET_TYPES['.html'])
+
+    logger.info(f"UI assets built: {', '.join(sorted(files))}")
+    return {'files': files, 'index': index}
+
+def send_asset(asset, max_age=None):
+    """Serve the best encoding the client accepts, answering If-None-Match with 304.
+
+    With `max_age` the response is public and immutable; without it the
+    client must revalidate each time (which costs a 304 when nothing changed).
+    """
+    accepted = request.accept_encodings
+    encoding = next((enc for enc in ('br', 'gzip') if enc in asset['variants'] and accepted[enc]), 'identity')
+
+    response = Response(asset['variants'][encoding], mimetype=asset['mimetype'])
+    response.vary.add('Accept-Encoding')
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    # Each encoding is a different byte sequence, so it gets its own strong ETag
+    response.set_etag(asset['etag'] if encoding == 'identity' else f"{asset['etag']}-{encoding}")
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/')
+def index():
+    """Serve the main page and clear session (except the id /process limits jobs by)."""
+    client_id = session.get('client_id')
+    session.clear()
+    if client_id:
+        session['client_id'] = client_id
+    return send_asset(get_assets()['index'])
+
+@app.route('/assets/<name>')
+def asset_file(name):
+    """Content-hashed CSS/JS; unknown or outdated names are 404."""
+    asset = get_assets()['files'].get(name)
+    if asset is None:
+        return jsonify({'error': 'Asset not found'}), 404
+    return send_asset(asset, ASSET_MAX_AGE)
 
 @app.route('/upload', methods=['POST'])
+@timed_stage(UPLOAD_SECONDS)
 def upload_files():
     """Handle file upload with enhanced validation."""
     try:
@@ -1126,103 +2644,466 @@ def upload_files():
         if len(files) > MAX_FILES:
             return jsonify({'error': f'Too many files. Maximum {MAX_FILES} files allowed'}), 400
 
-        # Create unique upload folder
-        upload_folder = os.path.join(UPLOAD_FOLDER, str(uuid.uuid4()))
-        os.makedirs(upload_folder, exist_ok=True)
+        # Add to the session's batch when asked, otherwise create a new one
+        batch_id, upload_folder = session_batch()
+        append = request.form.get('append') in ('1', 'true') and upload_folder is not None
+        if append and batch_busy(batch_id):
+            return jsonify({'error': 'Files are still being processed. Please wait.'}), 409
+        if not append:
+            batch_id = blob_store.new_batch()
+            upload_folder = blob_store.batch_path(batch_id)
 
         uploaded_files = []
         invalid_files = []
+        parsed = load_parsed_rows(upload_folder) if append else {}
 
-        for file in files:
-            if file and file.filename:
-                # Validate file type
-                if not allowed_file(file.filename):
-                    invalid_files.append(f"{file.filename} (invalid type)")
-                    continue
-                
-                # Validate file size
-                if not validate_file_size(file):
-                    invalid_files.append(f"{file.filename} (too large)")
-                    continue
-
-                filename = secure_filename(file.filename)
-                if filename:  # Ensure filename is not empty after sanitization
-                    file_path = os.path.join(upload_folder, filename)
-                    file.save(file_path)
-                    uploaded_files.append(filename)
+        try:
+            with upload_slot(batch_id, [f.filename for f in files]):
+                for file in files:
+                    if file and file.filename:
+                        uploaded, invalid = ingest_upload(file, upload_folder, parsed)
+                        uploaded_files.extend(uploaded)
+                        invalid_files.extend(invalid)
+        except JobRejected as e:
+            if not append:
+                blob_store.delete_batch(batch_id)
+            return busy_response(e)
+
+        if parsed or append:
+            save_parsed_rows(upload_folder, parsed)
 
         if not uploaded_files:
-            shutil.rmtree(upload_folder, ignore_errors=True)
+            if not append:
+                blob_store.delete_batch(batch_id)
             error_msg = "No valid files uploaded"
             if invalid_files:
                 error_msg += f". Issues: {', '.join(invalid_files)}"
             return jsonify({'error': error_msg}), 400
 
-        session['upload_folder'] = upload_folder
+        if append:
+            session.pop('job_id', None)
+        else:
+            replace_session_batch(batch_id)
         
         message = f"Successfully uploaded {len(uploaded_files)} file(s)"
         if invalid_files:
             message += f". Skipped {len(invalid_files)} invalid file(s)"
         
         logger.info(f"Upload successful: {message}")
-        return jsonify({'message': message})
+        return jsonify({'message': message, 'parsed': sum(f in parsed for f in uploaded_files)})
 
     except Exception as e:
         logger.error(f"Upload error: {str(e)}")
         return jsonify({'error': 'Upload failed due to server error'}), 500
 
+@app.route('/uploads', methods=['POST'])
+def start_chunked_upload():
+    """Start a chunked upload of one TXT file or archive."""
+    try:
+        options = request.get_json(silent=True) or {}
+        filename = options.get('filename') or ''
+        size = options.get('size')
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({'error': 'A positive integer size is required'}), 400
+        if is_archive(filename):
+            limit = MAX_ARCHIVE_BYTES
+        elif allowed_file(filename):
+            limit = MAX_FILE_SIZE
+        else:
+            return jsonify({'error': f"{filename or 'File'} is not a TXT file or archive"}), 400
+        if size > limit:
+            return jsonify({'error': f"{filename} is too large. Maximum {limit} bytes"}), 413
+
+        # New batch unless the client adds to the one it is uploading
+        batch_id, upload_folder = session_batch()
+        if not options.get('append') or upload_folder is None:
+            batch_id = blob_store.new_batch()
+            upload_folder = blob_store.batch_path(batch_id)
+            replace_session_batch(batch_id)
+
+        upload_id = uuid.uuid4().hex
+        part_path = chunk_path(upload_folder, upload_id)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        open(part_path, 'wb').close()
+        state_store.create_upload({
+            'upload_id': upload_id,
+            'batch_id': batch_id,
+            'filename': filename,
+            'size': size,
+            'sha256': options.get('sha256'),
+        })
+
+        return jsonify({'upload_id': upload_id, 'offset': 0, 'chunk_size': UPLOAD_CHUNK_SIZE}), 201
+
+    except Exception as e:
+        logger.error(f"Chunked upload start error: {str(e)}")
+        return jsonify({'error': 'Upload failed due to server error'}), 500
+
+@app.route('/uploads/<upload_id>')
+def chunked_upload_status(upload_id):
+    """Report how much of a chunked upload has arrived, so clients can resume."""
+    _, upload = find_chunked_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    return jsonify({
+        'upload_id': upload_id,
+        'filename': upload['filename'],
+        'size': upload['size'],
+        'offset': upload['received'],
+    })
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def put_chunk(upload_id):
+    """Write one chunk at ?offset=N, checking X-Chunk-SHA256 when sent."""
+    upload_folder, upload = find_chunked_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset query parameter is required'}), 400
+    if (request.content_length or 0) > UPLOAD_CHUNK_MAX:
+        return jsonify({'error': f'Chunk too large. Maximum {UPLOAD_CHUNK_MAX} bytes'}), 413
+
+    chunk = request.stream.read(UPLOAD_CHUNK_MAX + 1)
+    if len(chunk) > UPLOAD_CHUNK_MAX:
+        return jsonify({'error': f'Chunk too large. Maximum {UPLOAD_CHUNK_MAX} bytes'}), 413
+    expected = request.headers.get('X-Chunk-SHA256')
+    if expected and not hmac.compare_digest(hashlib.sha256(chunk).hexdigest(), expected.lower()):
+        return jsonify({'error': 'Chunk checksum mismatch', 'offset': offset}), 400
+
+    if offset + len(chunk) > upload['size']:
+        return jsonify({'error': 'Chunk goes past the declared size', 'offset': upload['received']}), 400
+    if offset != upload['received']:
+        # Lost or repeated chunk: tell the client where to continue
+        return jsonify({'error': f"Expected offset {upload['received']}", 'offset': upload['received']}), 409
+    # Make the bytes durable before the offset covers them, so a crash can
+    # only lose a chunk, never leave a hole that finalize would accept.
+    # A racing retry of the same chunk writes the same bytes at the same place.
+    with open(chunk_path(upload_folder, upload_id), 'r+b') as f:
+        f.seek(offset)
+        f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    if not state_store.advance_upload(upload_id, offset, len(chunk)):
+        current = state_store.get_upload(upload_id)['received']
+        return jsonify({'error': f'Expected offset {current}', 'offset': current}), 409
+
+    return jsonify({'offset': offset + len(chunk)})
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@timed_stage(UPLOAD_SECONDS)
+def finalize_chunked_upload(upload_id):
+    """Check a completed chunked upload and ingest it like /upload."""
+    try:
+        upload_folder, upload = find_chunked_upload(upload_id)
+        if upload is None:
+            return jsonify({'error': 'Unknown upload'}), 404
+        part_path = chunk_path(upload_folder, upload_id)
+
+        received = upload['received']
+        if received != upload['size'] or os.path.getsize(part_path) != upload['size']:
+            return jsonify({'error': f"Upload incomplete: {received} of {upload['size']} bytes",
+                            'offset': received}), 409
+        if batch_busy(upload['batch_id']):
+            return jsonify({'error': 'Files are still being processed. Please wait.'}), 409
+        try:
+            with upload_slot(upload['batch_id'], [upload['filename']]):
+                # Deleting the record is the claim: a repeated finalize gets a 404
+                if not state_store.delete_upload(upload_id):
+                    return jsonify({'error': 'Unknown upload'}), 404
+                if upload['sha256'] and not hmac.compare_digest(file_sha256(part_path), upload['sha256'].lower()):
+                    os.remove(part_path)
+                    return jsonify({'error': 'File checksum mismatch; upload it again'}), 400
+
+                parsed = load_parsed_rows(upload_folder)
+                with open(part_path, 'rb') as f:
+                    uploaded_files, invalid_files = ingest_upload(
+                        FileStorage(stream=f, filename=upload['filename']), upload_folder, parsed
+                    )
+                os.remove(part_path)
+                save_parsed_rows(upload_folder, parsed)
+        except JobRejected as e:
+            return busy_response(e)
+        session.pop('job_id', None)
+
+        if not uploaded_files:
+            error_msg = f"No valid files in {upload['filename']}"
+            if invalid_files:
+                error_msg += f". Issues: {', '.join(invalid_files)}"
+            return jsonify({'error': error_msg}), 400
+
+        message = f"Successfully uploaded {len(uploaded_files)} file(s)"
+        if invalid_files:
+            message += f". Skipped {len(invalid_files)} invalid file(s)"
+        logger.info(f"Chunked upload {upload_id} finished: {message}")
+        return jsonify({
+            'message': message,
+            'uploaded': len(uploaded_files),
+            'parsed': sum(f in parsed for f in uploaded_files),
+        })
+
+    except Exception as e:
+        logger.error(f"Chunked upload finalize error: {str(e)}")
+        return jsonify({'error': 'Upload failed due to server error'}), 500
+
 @app.route('/process', methods=['POST'])
 def process():
-    """Process uploaded files with enhanced error handling."""
+    """Queue the uploaded files for processing and return the job id."""
     try:
-        upload_folder = session.get('upload_folder')
-        if not upload_folder or not os.path.exists(upload_folder):
+        batch_id, upload_folder = session_batch()
+        if upload_folder is None:
             return jsonify({'error': 'No uploaded files found. Please upload files first.'}), 400
 
-        output_path = os.path.join(upload_folder, 'rekon_jf.xlsx')
-        success, message = process_files(upload_folder, output_path)
+        options = request.get_json(silent=True) or {}
+        fmt = request.args.get('format') or options.get('format') or 'xlsx'
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported format '{fmt}'. Choose one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        unavailable = format_unavailable(fmt)
+        if unavailable:
+            return jsonify({'error': unavailable}), 400
 
-        if not success:
-            shutil.rmtree(upload_folder, ignore_errors=True)
-            session.pop('upload_folder', None)
-            return jsonify({'error': message}), 400
+        profile = PROFILE_ALL_JOBS or (bool(request.headers.get('X-Rekon-Profile')) and is_admin())
+        client_id = session.setdefault('client_id', str(uuid.uuid4()))
+        try:
+            job_id = submit_job(batch_id, fmt, profile, client_id)
+        except JobRejected as e:
+            return busy_response(e)
 
-        session['output_path'] = output_path
-        logger.info(f"Processing successful: {message}")
-        return jsonify({'message': message})
+        session['job_id'] = job_id
+        logger.info(f"Processing queued: job {job_id}")
+        return jsonify({'job_id': job_id, 'status': 'queued'}), 202
 
     except Exception as e:
         logger.error(f"Processing error: {str(e)}")
         return jsonify({'error': 'Processing failed due to server error'}), 500
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report status and per-file progress of a processing job."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    result = {k: job[k] for k in ('job_id', 'status', 'processed', 'total', 'message')}
+    if job['status'] == 'queued':
+        result['position'] = state_store.queue_position(job_id)
+    if job['profile_name']:
+        result['profile'] = job['profile_name']
+    if job['status'] == 'error':
+        result['error'] = job['message']
+        if session.get('job_id') == job_id:
+            session.pop('batch_id', None)
+            session.pop('job_id', None)
+    return jsonify(result)
+
+@app.route('/jobs/<job_id>/validation')
+def job_validation(job_id):
+    """Consistency issues found by a finished job (see validate)."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Job is {job['status']}"}), 409
+    upload_folder = blob_store.batch_path(job['batch_id'])
+    path = os.path.join(upload_folder, VALIDATION_FILE) if upload_folder else None
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Validation results are no longer available'}), 404
+    with open(path) as f:
+        return jsonify(json.load(f))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Parse cache hit/miss counters."""
+    return jsonify(parse_cache.stats())
+
+@app.route('/api/v1/parse', methods=['POST'])
+def api_parse():
+    """Parse TXT files or archives from the request body and stream one entry per file.
+
+    Send multipart/form-data with any number of files, or a single file as
+    the raw body (?filename=... names it).  ?format=ndjson (or Accept:
+    application/x-ndjson) streams one JSON object per line; the default is
+    a JSON array.  Nothing is kept between calls.  Each call holds a
+    backlog slot while it streams, and gets 429 when the backlog is full.
+    """
+    fmt = request.args.get('format') or (
+        'ndjson' if request.accept_mimetypes.best_match(list(API_FORMATS.values())) == API_FORMATS['ndjson']
+        else 'json')
+    if fmt not in API_FORMATS:
+        return jsonify({'error': f"Unsupported format '{fmt}'. Choose one of: {', '.join(API_FORMATS)}"}), 400
+    if request.mimetype == 'multipart/form-data' and not request.mimetype_params.get('boundary'):
+        return jsonify({'error': 'Multipart body without a boundary'}), 400
+    if request.mimetype != 'multipart/form-data' and request.content_length == 0:
+        return jsonify({'error': 'No file in request body'}), 400
+    slot = ExitStack()
+    try:
+        slot.enter_context(work_slot())
+    except JobRejected as e:
+        return busy_response(e)
+
+    def entries():
+        try:
+            yield from iter_api_rows(iter_request_files())
+        except ValueError as e:
+            logger.warning(f"Parse API: malformed body: {str(e)}")
+            yield {'error': f"Malformed request body: {str(e)}"}
+
+    def body():
+        # The status line is already sent, so a bad body ends the stream with an error entry
+        if fmt == 'ndjson':
+            for entry in entries():
+                yield json.dumps(entry) + '\n'
+        else:
+            separator = '['
+            for entry in entries():
+                yield separator + json.dumps(entry)
+                separator = ',\n'
+            yield ']\n' if separator != '[' else '[]\n'
+
+    response = Response(stream_with_context(body()), mimetype=API_FORMATS[fmt])
+    # Released when the server closes the response, even if the body was never read
+    response.call_on_close(slot.close)
+    return response
+
+def history_query_args():
+    """Common /history query arguments: from, to and sofcode."""
+    return request.args.get('from'), request.args.get('to'), request.args.get('sofcode')
+
+@app.route('/history/rows')
+def history_rows():
+    """Stored rows for a statement date range (admin only).
+
+    ?from=2024-01&to=2024-12&sofcode=JFCS2&limit=1000&offset=0
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    if history_store is None:
+        return jsonify({'error': 'History is disabled'}), 404
+    limit = min(request.args.get('limit', 1000, type=int), HISTORY_MAX_ROWS)
+    offset = request.args.get('offset', 0, type=int)
+    try:
+        rows = history_store.rows(*history_query_args(), limit=limit, offset=offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'rows': rows, 'count': len(rows), 'limit': limit, 'offset': offset})
+
+@app.route('/history/aggregate')
+def history_aggregate():
+    """Files and summed amounts per day/month/year, optionally per SOFCODE (admin only).
+
+    ?from=2022&to=2024&period=month&group=sofcode
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    if history_store is None:
+        return jsonify({'error': 'History is disabled'}), 404
+    period = request.args.get('period', 'month')
+    if period not in HistoryStore.PERIODS:
+        return jsonify({'error': f"Unsupported period '{period}'. Choose one of: {', '.join(HistoryStore.PERIODS)}"}), 400
+    try:
+        rows = history_store.aggregate(*history_query_args(), period=period,
+                                       by_sofcode=request.args.get('group') == 'sofcode')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'period': period, 'rows': rows})
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """List saved job profiles (admin only)."""
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    if not os.path.isdir(PROFILE_FOLDER):
+        return jsonify({'profiles': []})
+    profiles = [
+        {'name': f, 'size': os.path.getsize(os.path.join(PROFILE_FOLDER, f))}
+        for f in sorted(os.listdir(PROFILE_FOLDER), reverse=True) if f.endswith('.prof')
+    ]
+    return jsonify({'profiles': profiles})
+
+@app.route('/admin/profiles/<name>')
+def get_profile(name):
+    """Fetch one profile as raw cProfile data, or ?format=text for a pstats summary."""
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    path = os.path.abspath(os.path.join(PROFILE_FOLDER, secure_filename(name)))
+    if not name.endswith('.prof') or not os.path.exists(path):
+        return jsonify({'error': 'Profile not found'}), 404
+
+    if request.args.get('format') == 'text':
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(60)
+        return app.response_class(out.getvalue(), mimetype='text/plain')
+    return send_file(path, as_attachment=True, download_name=name, mimetype='application/octet-stream')
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms and counters in Prometheus text format."""
+    body = render_metrics()
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
 @app.route('/download')
+@timed_stage(DOWNLOAD_SECONDS)
 def download():
     """Handle file download with cleanup."""
     try:
-        output_path = session.get('output_path')
+        job_id = session.get('job_id')
+        job = get_job(job_id) if job_id else None
+        if job and job['status'] in ('queued', 'running'):
+            return jsonify({'error': 'Files are still being processed. Please wait.'}), 409
+
+        fmt = job['format'] if job else request.args.get('format', 'xlsx')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported format '{fmt}'"}), 400
+        unavailable = format_unavailable(fmt)
+        if unavailable and not job:
+            return jsonify({'error': unavailable}), 400
+
+        batch_id, upload_folder = session_batch()
+        output_path = None
+        if job and job['status'] == 'done':
+            batch_id, upload_folder = job['batch_id'], blob_store.batch_path(job['batch_id'])
+            output_path = os.path.join(upload_folder, job['output']) if upload_folder else None
+        elif (not job and upload_folder
+                and os.path.exists(os.path.join(upload_folder, PARSED_ROWS_FILE))):
+            # Files parsed during upload need no /process step: build the output now
+            output_path = os.path.join(upload_folder, f'rekon_jf.{EXPORT_FORMATS[fmt][1]}')
+            client_id = session.setdefault('client_id', str(uuid.uuid4()))
+            try:
+                with work_slot(client_id, batch_id):
+                    success, message = process_files(upload_folder, output_path, fmt=fmt)
+            except JobRejected as e:
+                return busy_response(e)
+            if not success:
+                return jsonify({'error': message}), 400
+
         if not output_path or not os.path.exists(output_path):
             return jsonify({'error': 'No processed file available. Please process files first.'}), 400
-
-        upload_folder = os.path.dirname(output_path)
         
         # Generate timestamp for filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        download_name = f'rekon_jf_{timestamp}.xlsx'
+        _, extension, mimetype, _ = EXPORT_FORMATS[fmt]
+        download_name = f'rekon_jf_{timestamp}.{extension}'
         
         response = send_file(
             output_path, 
             as_attachment=True, 
             download_name=download_name,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            mimetype=mimetype
         )
 
         # Schedule cleanup after response
         @response.call_on_close
         def cleanup():
             try:
-                shutil.rmtree(upload_folder, ignore_errors=True)
-                session.pop('upload_folder', None)
-                session.pop('output_path', None)
+                if KEEP_SESSIONS:
+                    # Only the output goes; parsed rows stay for the next /process
+                    os.remove(output_path)
+                else:
+                    blob_store.delete_batch(batch_id)
+                if job_id:
+                    discard_job(job_id)
+                session.pop('batch_id', None)
+                session.pop('job_id', None)
                 logger.info("Cleanup completed")
             except Exception as e:
                 logger.error(f"Cleanup error: {str(e)}")
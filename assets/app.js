@@ -0,0 +1,429 @@
+let selectedFiles = [];
+
+// Markup for one of the inline SVG icons defined at the top of the page
+function icon(name, classes = '') {
+    return `<svg class="icon ${classes}"><use href="#i-${name}"/></svg>`;
+}
+
+// File input change handler
+document.getElementById('fileInput').addEventListener('change', function(e) {
+    handleFiles(e.target.files);
+});
+
+// Drag and drop handlers
+const uploadArea = document.getElementById('uploadArea');
+
+uploadArea.addEventListener('dragover', function(e) {
+    e.preventDefault();
+    uploadArea.classList.add('dragover');
+});
+
+uploadArea.addEventListener('dragleave', function(e) {
+    e.preventDefault();
+    uploadArea.classList.remove('dragover');
+});
+
+uploadArea.addEventListener('drop', function(e) {
+    e.preventDefault();
+    uploadArea.classList.remove('dragover');
+    handleFiles(e.dataTransfer.files);
+});
+
+function handleFiles(files) {
+    selectedFiles = Array.from(files).filter(file => /\.(txt|zip|tar\.gz|tgz)$/i.test(file.name));
+    displaySelectedFiles();
+    
+    const uploadBtn = document.getElementById('uploadBtn');
+    uploadBtn.disabled = selectedFiles.length === 0;
+    
+    if (selectedFiles.length === 0) {
+        showStatus('Please select at least one TXT file.', 'error');
+    } else {
+        showStatus(`${selectedFiles.length} file(s) selected`, 'info');
+    }
+}
+
+function displaySelectedFiles() {
+    const filesList = document.getElementById('filesList');
+    const filesContainer = document.getElementById('filesContainer');
+    
+    if (selectedFiles.length === 0) {
+        filesList.classList.add('hidden');
+        return;
+    }
+    
+    filesList.classList.remove('hidden');
+    filesContainer.innerHTML = '';
+    
+    selectedFiles.forEach((file, index) => {
+        const fileItem = document.createElement('div');
+        fileItem.className = 'file-item flex items-center justify-between p-4 rounded-xl shadow-sm border';
+        fileItem.innerHTML = `
+            <div class="flex items-center">
+                ${icon('file-alt', 'text-blue-600 mr-4 text-lg')}
+                <div>
+                    <p class="font-semibold text-gray-800">${file.name}</p>
+                    <p class="text-sm text-gray-500">${formatFileSize(file.size)}</p>
+                </div>
+            </div>
+            <button onclick="removeFile(${index})" class="text-red-500 hover:text-red-700 p-2 rounded-lg hover:bg-red-50 transition-colors">
+                ${icon('times')}
+            </button>
+        `;
+        filesContainer.appendChild(fileItem);
+    });
+}
+
+function removeFile(index) {
+    selectedFiles.splice(index, 1);
+    displaySelectedFiles();
+    
+    const uploadBtn = document.getElementById('uploadBtn');
+    uploadBtn.disabled = selectedFiles.length === 0;
+    
+    if (selectedFiles.length === 0) {
+        showStatus('No files selected', 'info');
+    } else {
+        showStatus(`${selectedFiles.length} file(s) selected`, 'info');
+    }
+}
+
+function formatFileSize(bytes) {
+    if (bytes === 0) return '0 Bytes';
+    const k = 1024;
+    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+    const i = Math.floor(Math.log(bytes) / Math.log(k));
+    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+}
+
+function updateStep(step, completed = false) {
+    const stepElement = document.getElementById(`step${step}`);
+    const progressElement = document.getElementById(`progress${step}`);
+    
+    if (completed) {
+        stepElement.className = 'w-10 h-10 step-completed rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
+        stepElement.innerHTML = icon('check');
+        if (progressElement) {
+            progressElement.style.width = '100%';
+        }
+    } else {
+        stepElement.className = 'w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
+        stepElement.textContent = step;
+    }
+    
+    // Update next step to active if current is completed
+    if (completed && step < 3) {
+        const nextStep = document.getElementById(`step${step + 1}`);
+        nextStep.className = 'w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
+        nextStep.textContent = step + 1;
+    }
+}
+
+function showStatus(message, type = 'info') {
+    const status = document.getElementById('status');
+    const errorDetails = document.getElementById('errorDetails');
+    
+    const colors = {
+        'info': 'text-blue-700 font-medium',
+        'success': 'text-green-700 font-semibold',
+        'error': 'text-red-700 font-semibold',
+        'warning': 'text-amber-700 font-semibold'
+    };
+    
+    status.className = `text-center ${colors[type] || colors.info}`;
+    status.textContent = message;
+    
+    // Hide error details for non-error messages
+    if (type !== 'error') {
+        errorDetails.classList.add('hidden');
+    }
+}
+
+function showError(message, details = null) {
+    showStatus(message, 'error');
+    
+    if (details) {
+        const errorDetails = document.getElementById('errorDetails');
+        const errorMessage = document.getElementById('errorMessage');
+        errorMessage.textContent = details;
+        errorDetails.classList.remove('hidden');
+    }
+}
+
+function showLoading(show = true) {
+    const spinner = document.getElementById('loadingSpinner');
+    if (show) {
+        spinner.classList.remove('hidden');
+    } else {
+        spinner.classList.add('hidden');
+    }
+}
+
+// Large selections go through /uploads in chunks so a dropped
+// connection only costs the chunk in flight, not the whole batch.
+const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+const CHUNK_RETRIES = 8;
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+async function sha256Hex(blob) {
+    if (!window.crypto || !crypto.subtle) return null;  // only on HTTPS / localhost
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadChunked(files, append) {
+    let uploaded = 0, parsed = 0, skipped = [];
+    for (const [index, file] of files.entries()) {
+        let response = await fetch('/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, append: append || index > 0 })
+        });
+        let result = await response.json();
+        if (!response.ok) return { response, result };
+
+        const { upload_id: uploadId, chunk_size: chunkSize } = result;
+        let offset = 0, failures = 0;
+        while (offset < file.size) {
+            showStatus(`Uploading ${file.name}: ${Math.floor(offset * 100 / file.size)}% (${index + 1}/${files.length})`, 'info');
+            const chunk = file.slice(offset, offset + chunkSize);
+            const headers = {};
+            const checksum = await sha256Hex(chunk);
+            if (checksum) headers['X-Chunk-SHA256'] = checksum;
+            try {
+                response = await fetch(`/uploads/${uploadId}?offset=${offset}`, { method: 'PUT', headers, body: chunk });
+                result = await response.json();
+                if (response.ok || response.status === 409) {
+                    offset = result.offset;
+                    failures = 0;
+                    continue;
+                }
+                if (response.status !== 400) return { response, result };
+            } catch (error) {
+                // Network drop: ask the server how far we got, then resume
+                try {
+                    const status = await fetch(`/uploads/${uploadId}`);
+                    if (status.ok) offset = (await status.json()).offset;
+                } catch (ignored) {}
+            }
+            if (++failures > CHUNK_RETRIES) throw new Error(`Giving up on ${file.name} after ${CHUNK_RETRIES} retries`);
+            await sleep(Math.min(1000 * 2 ** failures, 30000));
+        }
+
+        response = await fetch(`/uploads/${uploadId}/finalize`, { method: 'POST' });
+        result = await response.json();
+        if (response.ok) {
+            uploaded += result.uploaded;
+            parsed += result.parsed;
+        } else {
+            skipped.push(`${file.name}: ${result.error}`);
+        }
+    }
+    if (uploaded === 0) {
+        return { response: { ok: false }, result: { error: skipped.join('; ') || 'No valid files uploaded' } };
+    }
+    let message = `Successfully uploaded ${uploaded} file(s)`;
+    if (skipped.length) message += `. Skipped: ${skipped.join('; ')}`;
+    return { response: { ok: true }, result: { message, parsed } };
+}
+
+async function uploadFiles() {
+    if (selectedFiles.length === 0) {
+        showStatus('Please select at least one TXT file.', 'error');
+        return;
+    }
+
+    const uploadBtn = document.getElementById('uploadBtn');
+    const processBtn = document.getElementById('processBtn');
+    
+    uploadBtn.disabled = true;
+    showLoading(true);
+    showStatus('Uploading files...', 'info');
+
+    const totalSize = selectedFiles.reduce((sum, file) => sum + file.size, 0);
+    const append = document.getElementById('appendToBatch').checked;
+
+    try {
+        let response, result;
+        if (totalSize > CHUNKED_UPLOAD_THRESHOLD) {
+            ({ response, result } = await uploadChunked(selectedFiles, append));
+        } else {
+            const formData = new FormData();
+            selectedFiles.forEach(file => {
+                formData.append('files', file);
+            });
+            if (append) formData.append('append', '1');
+            response = await fetch('/upload', {
+                method: 'POST',
+                body: formData
+            });
+            result = await response.json();
+        }
+
+        showLoading(false);
+
+        if (response.ok) {
+            updateStep(1, true);
+            updateStep(2, false);
+            showStatus(result.message, 'success');
+            document.getElementById('appendOption').classList.remove('hidden');
+            processBtn.disabled = false;
+        } else {
+            showError(`Upload failed: ${result.error}`);
+            uploadBtn.disabled = false;
+        }
+    } catch (error) {
+        showLoading(false);
+        showError('Network error during upload', error.message);
+        uploadBtn.disabled = false;
+    }
+}
+
+async function processFiles() {
+    const processBtn = document.getElementById('processBtn');
+    
+    processBtn.disabled = true;
+    showLoading(true);
+    showStatus('Processing files...', 'info');
+
+    try {
+        const response = await fetch('/process', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            }
+        });
+        
+        const result = await response.json();
+
+        if (response.ok) {
+            pollJob(result.job_id);
+        } else if (response.status === 429) {
+            // Backlog full: wait as long as the server suggests, then ask again
+            const wait = parseInt(response.headers.get('Retry-After'), 10) || result.retry_after || 30;
+            showStatus(`${result.error}. Queue position ~${result.position}, retrying in ${wait}s...`, 'warning');
+            setTimeout(processFiles, wait * 1000);
+        } else {
+            showLoading(false);
+            showError(`Processing failed: ${result.error}`);
+            processBtn.disabled = false;
+        }
+    } catch (error) {
+        showLoading(false);
+        showError('Network error during processing', error.message);
+        processBtn.disabled = false;
+    }
+}
+
+async function pollJob(jobId) {
+    const processBtn = document.getElementById('processBtn');
+    const downloadBtn = document.getElementById('downloadBtn');
+
+    try {
+        const response = await fetch(`/jobs/${jobId}`);
+        const result = await response.json();
+
+        if (response.ok && (result.status === 'queued' || result.status === 'running')) {
+            if (result.status === 'queued' && result.position) {
+                showStatus(`Waiting in queue (position ${result.position})...`, 'info');
+            } else if (result.total > 0) {
+                showStatus(`Processing files... (${result.processed}/${result.total})`, 'info');
+            }
+            setTimeout(() => pollJob(jobId), 1000);
+            return;
+        }
+
+        showLoading(false);
+        if (response.ok && result.status === 'done') {
+            updateStep(2, true);
+            updateStep(3, false);
+            showStatus(result.message, 'success');
+            downloadBtn.disabled = false;
+            document.getElementById('successMessage').classList.remove('hidden');
+        } else {
+            showError(`Processing failed: ${result.error}`);
+            processBtn.disabled = false;
+        }
+    } catch (error) {
+        showLoading(false);
+        showError('Network error during processing', error.message);
+        processBtn.disabled = false;
+    }
+}
+
+async function downloadFile() {
+    const downloadBtn = document.getElementById('downloadBtn');
+    const uploadBtn = document.getElementById('uploadBtn');
+    
+    downloadBtn.disabled = true;
+    showLoading(true);
+    showStatus('Preparing download...', 'info');
+
+    try {
+        const response = await fetch('/download');
+        if (response.ok) {
+            const blob = await response.blob();
+            const url = window.URL.createObjectURL(blob);
+            const a = document.createElement('a');
+            a.href = url;
+            a.download = 'rekon_jf.xlsx';
+            document.body.appendChild(a);
+            a.click();
+            a.remove();
+            window.URL.revokeObjectURL(url);
+
+            showLoading(false);
+            updateStep(3, true);
+            showStatus('File downloaded successfully! Ready for new files.', 'success');
+            
+            // Reset for new upload
+            setTimeout(() => {
+                resetForm();
+            }, 2000);
+        } else {
+            const result = await response.json();
+            showLoading(false);
+            showError(`Download failed: ${result.error}`);
+            downloadBtn.disabled = false;
+        }
+    } catch (error) {
+        showLoading(false);
+        showError('Network error during download', error.message);
+        downloadBtn.disabled = false;
+    }
+}
+
+function resetForm() {
+    // Reset file selection
+    selectedFiles = [];
+    document.getElementById('fileInput').value = '';
+    document.getElementById('filesList').classList.add('hidden');
+    
+    // Reset buttons
+    document.getElementById('uploadBtn').disabled = false;
+    document.getElementById('processBtn').disabled = true;
+    document.getElementById('downloadBtn').disabled = true;
+    
+    // Reset steps with FIFGroup styling
+    document.getElementById('step1').className = 'w-10 h-10 step-active rounded-full flex items-center justify-center text-white text-sm font-bold shadow-lg';
+    document.getElementById('step1').textContent = '1';
+    document.getElementById('step2').className = 'w-10 h-10 step-inactive rounded-full flex items-center justify-center text-sm font-bold';
+    document.getElementById('step2').textContent = '2';
+    document.getElementById('step3').className = 'w-10 h-10 step-inactive rounded-full flex items-center justify-center text-sm font-bold';
+    document.getElementById('step3').textContent = '3';
+    
+    // Reset progress bars
+    document.getElementById('progress1').style.width = '0%';
+    document.getElementById('progress2').style.width = '0%';
+    
+    // Hide messages
+    document.getElementById('successMessage').classList.add('hidden');
+    document.getElementById('errorDetails').classList.add('hidden');
+    
+    // Reset status
+    showStatus('Select TXT files to get started', 'info');
+}
+
+// Initialize
+showStatus('Select TXT files to get started', 'info');
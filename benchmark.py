@@ -0,0 +1,282 @@
+"""Reproducible parser/export benchmarks on synthetic JF letters.
+
+Examples:
+    python benchmark.py -o bench.json
+    python benchmark.py --quick --compare bench.json     # exit 1 on regression
+    python benchmark.py --generate samples/ --count 50   # just write letters
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import app
+
+# Points a) .. i) in the order banks print them, with the keyword phrasing
+# that parse_jf_text looks for.
+LETTER_POINTS = [
+    ("a", "Pembayaran angsuran"),
+    ("b", "Pembayaran denda"),
+    ("c", "Pembayaran pelunasan dipercepat"),
+    ("d", "Denda pelunasan dipercepat"),
+    ("e", "Pembayaran penalti pelunasan dipercepat"),
+    ("f", "Pembayaran pelunasan dipercepat karena pencairan tagihan asuransi"),
+    ("g", "Pembayaran penalti pelunasan dipercepat karena pencairan tagihan asuransi"),
+    ("h", "Pembayaran recovery"),
+    ("i", "Penghapusan denda konsumen"),
+]
+
+SOFCODES = ["JFCS2COVI", "JFCS2", "JFJ", "JFJR", "JFPI5COVID", "JFBRI", "JFMDR3"]
+
+FILLER = (
+    "Rincian transaksi terlampir pada daftar nominatif konsumen yang merupakan "
+    "bagian tidak terpisahkan dari surat ini.\r\n"
+)
+
+ESC = "\x1b"
+
+
+def format_number(rng, n):
+    """Render n the way bank letters do: dots, commas, plain or with ',-'."""
+    style = rng.randrange(4)
+    if style == 0:
+        return f"{n:,}".replace(",", ".")
+    if style == 1:
+        return f"{n:,}"
+    if style == 2:
+        return str(n)
+    return f"{n:,}".replace(",", ".") + ",-"
+
+
+def control_wrap(rng, s):
+    """Wrap a value in printer control sequences (ESC E ... ESC F) half the time."""
+    return f"{ESC}E{s}{ESC}F" if rng.random() < 0.5 else s
+
+
+def generate_filename(rng, day=None):
+    """Filename in the bank's 'JFCS2COVI-1_FIFJIN_YYMMDD.txt' style."""
+    day = day or date(2024, 1, 1) + timedelta(days=rng.randrange(730))
+    return f"{rng.choice(SOFCODES)}-{rng.randint(1, 3)}_FIFJIN_{day:%y%m%d}.txt"
+
+
+def generate_letter(rng, size=4096):
+    """One JF letter covering every lettered point, padded to about `size` bytes."""
+    amounts = [rng.choice([0, rng.randint(1_000, 900_000_000)]) for _ in LETTER_POINTS]
+    lines = [
+        "PT FEDERAL INTERNATIONAL FINANCE",
+        f"Kepada Yth. Bank JF ({rng.choice(SOFCODES)})",
+        "Perihal : Pemberitahuan Dana Pembayaran",
+        "",
+        "Bersama ini kami sampaikan transfer dana pembayaran sejumlah Rp. "
+        + control_wrap(rng, format_number(rng, sum(amounts))),
+        "dengan rincian sebagai berikut:",
+    ]
+    for (letter, phrase), amount in zip(LETTER_POINTS, amounts):
+        count = 0 if amount == 0 else rng.randint(1, 5000)
+        lines.append(
+            f"{letter}) {phrase} sebesar Rp. {control_wrap(rng, format_number(rng, amount))} "
+            f"untuk {control_wrap(rng, format_number(rng, count))} Konsumen"
+        )
+    lines += ["", "Demikian kami sampaikan, atas perhatiannya kami ucapkan terima kasih.", ""]
+
+    body = "\r\n".join(lines).encode("latin-1")
+    if len(body) < size:
+        body += (FILLER.encode("latin-1") * ((size - len(body)) // len(FILLER) + 1))[: size - len(body)]
+    return body
+
+
+def write_letters(folder, count, size, seed=0):
+    """Write `count` letters into `folder` with unique bank-style filenames."""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        name = generate_filename(rng)
+        name = name.replace(".txt", f"_{i:05d}.txt")
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(generate_letter(rng, size))
+
+
+def timed(fn, repeat):
+    """Run fn `repeat` times and return wall times in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def result(name, times, items=1, **params):
+    return {
+        "name": name,
+        "params": params,
+        "repeat": len(times),
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "per_item_s": min(times) / items,
+    }
+
+
+def run_benchmarks(sizes, batch_sizes, repeat, workers, seed=0):
+    rng = random.Random(seed)
+    results = []
+
+    # Measure parsing, not the content-hash cache (reported separately below)
+    cached = app.parse_cache
+    app.parse_cache = app.ParseCache(0)
+    try:
+        for size in sizes:
+            raw = generate_letter(rng, size)
+            text = app.extract_text_from_file(raw)
+            name = generate_filename(rng)
+
+            results.append(result("extract_text_from_file", timed(lambda: app.extract_text_from_file(raw), repeat), size=size))
+            results.append(result("sum_category", timed(
+                lambda: [app.sum_category(pat, text) for _, pat in app.CATEGORY_RULES], repeat),
+                items=len(app.CATEGORY_RULES), size=size))
+            results.append(result("parse_jf_text", timed(lambda: app.parse_jf_text(raw, name), repeat), size=size))
+
+        numbers = [format_number(rng, rng.randint(0, 10**9)) for _ in range(10000)]
+        results.append(result("to_int", timed(lambda: [app.to_int(n) for n in numbers], repeat), items=len(numbers)))
+    finally:
+        app.parse_cache = cached
+
+    raw = generate_letter(rng, sizes[0])
+    warm = app.ParseCache(16)
+    app.parse_cache, cached = warm, app.parse_cache
+    try:
+        app.parse_jf_text(raw, "warm.txt")
+        results.append(result("parse_jf_text_cached", timed(lambda: app.parse_jf_text(raw, "warm.txt"), repeat), size=sizes[0]))
+    finally:
+        app.parse_cache = cached
+
+    for batch in batch_sizes:
+        parsed = [(f"{i}.txt", dict({col: rng.randint(0, 10**9) for col in app.AMOUNT_COLUMNS},
+                                     **{"BANK JF/SOFCODE": rng.choice(SOFCODES)}), None) for i in range(batch)]
+        results.append(result("collect_rows", timed(lambda: app.collect_rows(iter(parsed), batch)[0].to_frame(), repeat),
+                              items=batch, batch=batch))
+        df = app.collect_rows(iter(parsed), batch)[0].to_frame()
+        tmp = tempfile.mkdtemp(prefix="rekon_bench_")
+        try:
+            for fmt, (_, extension, _, writer) in app.EXPORT_FORMATS.items():
+                output = os.path.join(tmp, f"out.{extension}")
+                logging.disable(logging.ERROR)
+                try:
+                    available = writer(df.head(1), output)
+                finally:
+                    logging.disable(logging.NOTSET)
+                if not available:
+                    continue  # optional dependency missing (e.g. pyarrow)
+                results.append(result(f"export_{fmt}", timed(lambda: writer(df, output), repeat),
+                                      items=batch, batch=batch))
+
+            letters = os.path.join(tmp, "letters")
+            write_letters(letters, batch, sizes[0], seed)
+            output = os.path.join(tmp, "rekon_jf.xlsx")
+            cached = app.parse_cache
+            app.parse_cache = app.ParseCache(0)
+            try:
+                seen = os.path.join(letters, app.SEEN_FILES_FILE)
+
+                def run():
+                    # Without this, every repeat after the first reuses the stored rows
+                    if os.path.exists(seen):
+                        os.remove(seen)
+                    # record=False: benchmark letters must not end up in the real history store
+                    app.process_files(letters, output, workers, record=False)
+
+                results.append(result("process_files", timed(run, repeat),
+                                      items=batch, batch=batch, workers=workers))
+            finally:
+                app.parse_cache = cached
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (name, params, old, new) for results slower than baseline * threshold."""
+    old = {(r["name"], json.dumps(r["params"], sort_keys=True)): r["min_s"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        key = (r["name"], json.dumps(r["params"], sort_keys=True))
+        if key in old and r["min_s"] > old[key] * threshold:
+            regressions.append((r["name"], r["params"], old[key], r["min_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Rekon JF parser and exporters.")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[4 * 1024, 64 * 1024, 1024 * 1024, app.MAX_FILE_SIZE],
+                        help="letter sizes in bytes")
+    parser.add_argument("--batches", type=int, nargs="+", default=[10, 50, 200], help="batch sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=app.PARSE_WORKERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="small sizes and batches, 3 repeats")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown vs baseline")
+    parser.add_argument("--generate", metavar="DIR", help="only write synthetic letters to DIR")
+    parser.add_argument("--count", type=int, default=50, help="letters to write with --generate")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    app.keep_metrics_local()
+    # Parse workers build their parse_cache from these when they import app, so
+    # they neither serve benchmark letters from cache nor add them to the real one
+    os.environ["REKON_PARSE_CACHE_SIZE"] = "0"
+    os.environ["REKON_PARSE_CACHE_DB"] = ""
+
+    if args.generate:
+        write_letters(args.generate, args.count, args.sizes[0], args.seed)
+        print(f"Wrote {args.count} letters to {args.generate}")
+        return 0
+
+    if args.quick:
+        args.sizes, args.batches, args.repeat = [4 * 1024, 256 * 1024], [10, 50], 3
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parser_version": app.PARSER_VERSION,
+            "seed": args.seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": run_benchmarks(args.sizes, args.batches, args.repeat, args.workers, args.seed),
+    }
+
+    for r in report["results"]:
+        params = " ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{r['name']:<24} {params:<28} min {r['min_s'] * 1000:10.3f} ms  "
+              f"per item {r['per_item_s'] * 1e6:10.1f} us")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+        for name, params, old, new in regressions:
+            print(f"REGRESSION {name} {params}: {old * 1000:.3f} ms -> {new * 1000:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
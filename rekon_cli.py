@@ -0,0 +1,134 @@
+"""Headless batch reconciliation: parse JF TXT letters without the web UI.
+
+Examples:
+    python rekon_cli.py archive/2024/ -o rekon_2024.xlsx
+    python rekon_cli.py "archive/**/*.txt" -o rekon_all.xlsx --workers 8
+    python rekon_cli.py archive/ -o rekon.parquet      # format from the extension
+    python rekon_cli.py archive/2019/ -o rekon_2019.csv --no-history
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+from app import (
+    EXPORT_FORMATS,
+    PARSE_WORKERS,
+    collect_rows,
+    export_rows,
+    format_unavailable,
+    iter_parse_files,
+    keep_metrics_local,
+    recording_history,
+    result_message,
+)
+
+logger = logging.getLogger("rekon_cli")
+
+
+def find_txt_files(inputs, recursive=False):
+    """Expand directories, globs and plain paths into a sorted list of TXT files."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.txt") if recursive else os.path.join(item, "*.txt")
+            found.update(glob.glob(pattern, recursive=recursive))
+        elif glob.has_magic(item):
+            found.update(p for p in glob.glob(item, recursive=True) if p.endswith(".txt"))
+        elif os.path.isfile(item):
+            found.add(item)
+        else:
+            logger.warning(f"Input not found: {item}")
+    return sorted(found)
+
+
+def progress_printer(stream=sys.stderr, interval=1.0):
+    """Progress callback that prints at most once per `interval` seconds."""
+    started = time.monotonic()
+    last = [0.0]
+
+    def progress(done, total):
+        now = time.monotonic()
+        if done != total and now - last[0] < interval:
+            return
+        last[0] = now
+        rate = done / max(now - started, 1e-9)
+        stream.write(f"\r{done}/{total} files ({rate:.0f} files/s)")
+        if done == total:
+            stream.write("\n")
+        stream.flush()
+
+    return progress
+
+
+def format_for(output):
+    """Export format implied by the output file extension (xlsx if unknown)."""
+    extension = os.path.splitext(output)[1].lstrip(".").lower()
+    for fmt, (_, ext, _, _) in EXPORT_FORMATS.items():
+        if ext == extension:
+            return fmt
+    return "xlsx"
+
+
+def run(inputs, output, workers=None, recursive=False, show_progress=True, fmt=None, history=True):
+    """Parse every TXT file under `inputs` and write `output`; returns an exit code.
+
+    With `history`, the parsed rows are also added to the app's history store.
+    """
+    fmt = fmt or format_for(output)
+    unavailable = format_unavailable(fmt)
+    if unavailable:
+        logger.error(unavailable)
+        return 1
+
+    paths = find_txt_files(inputs, recursive)
+    if not paths:
+        logger.error("No TXT files found")
+        return 1
+
+    results = ((os.path.basename(path), data, error) for path, data, error in iter_parse_files(paths, workers))
+    if history:
+        results = recording_history(results)
+    progress = progress_printer() if show_progress else None
+    rows, error_files = collect_rows(results, len(paths), progress)
+
+    if not rows:
+        logger.error("No valid data found in any files")
+        return 1
+
+    success, issues = export_rows(rows, output, fmt)
+    if not success:
+        logger.error(f"Failed to create {EXPORT_FORMATS[fmt][0]} file")
+        return 1
+
+    for issue in issues.itertuples(index=False):
+        logger.warning(f"Row {issue.NO}: {issue.Check} in {issue.Column} "
+                       f"(actual {issue.Actual}, expected {issue.Expected})")
+    print(f"{result_message(rows, error_files, len(issues))} -> {output}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile JF TXT letters into a Rekon JF workbook.")
+    parser.add_argument("inputs", nargs="+", help="TXT files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="rekon_jf.xlsx", help="output file (default: rekon_jf.xlsx)")
+    parser.add_argument("-f", "--format", choices=sorted(EXPORT_FORMATS),
+                        help="output format (default: from the output extension)")
+    parser.add_argument("-w", "--workers", type=int, default=PARSE_WORKERS,
+                        help=f"parser processes (default: {PARSE_WORKERS})")
+    parser.add_argument("-r", "--recursive", action="store_true", help="search directories recursively")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every file")
+    parser.add_argument("--no-history", action="store_true", help="don't add the rows to the history store")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    keep_metrics_local()
+    return run(args.inputs, args.output, args.workers, args.recursive, not args.quiet, args.format,
+               not args.no_history)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
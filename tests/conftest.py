@@ -0,0 +1,44 @@
+"""Shared test setup: scratch stores, sample letters, no background threads."""
+import os
+import random
+import tempfile
+
+import pytest
+
+# Set before any test module imports app
+_scratch = tempfile.mkdtemp(prefix="rekon_tests_")
+os.environ.update({
+    "REKON_UPLOAD_FOLDER": os.path.join(_scratch, "uploads"),
+    "REKON_STATE_DB": os.path.join(_scratch, "state.sqlite3"),
+    "REKON_HISTORY_DB": os.path.join(_scratch, "history.sqlite3"),
+    "REKON_METRICS_DIR": "",
+    "REKON_PARSE_CACHE_DB": "",
+})
+
+
+@pytest.fixture(autouse=True)
+def no_background_threads(monkeypatch):
+    """Tests drive the job runners and the janitor by hand."""
+    import app
+    monkeypatch.setattr(app, "start_janitor", lambda: None)
+    monkeypatch.setattr(app, "start_job_runners", lambda: None)
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Fresh state_store and blob_store for one test."""
+    import app
+    state = app.SQLiteStateStore(str(tmp_path / "state.sqlite3"))
+    blobs = app.FilesystemBlobStore(str(tmp_path / "uploads"))
+    monkeypatch.setattr(app, "state_store", state)
+    monkeypatch.setattr(app, "blob_store", blobs)
+    monkeypatch.setattr(app, "PROFILE_FOLDER", str(tmp_path / "profiles"))
+    return state, blobs
+
+
+@pytest.fixture
+def letter():
+    """Synthetic JF letter bytes, as benchmark.py writes them."""
+    from benchmark import generate_letter
+    rng = random.Random(0)
+    return lambda: generate_letter(rng, 2048)
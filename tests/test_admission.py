@@ -0,0 +1,83 @@
+"""Admission control: the job backlog, 429 answers and the parse API."""
+import io
+import json
+import zipfile
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(stores):
+    return app.app.test_client()
+
+
+def upload(client, letter, name="JFCS2-1_FIFIP_PKKF01072025.txt"):
+    response = client.post("/upload", data={"files": (io.BytesIO(letter()), name)},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+def zipped(letter, count=2):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        for i in range(count):
+            z.writestr(f"JFCS2-1_FIFIP_PKKF0{i + 1}072025.txt", letter())
+    return buffer.getvalue()
+
+
+def test_second_job_of_one_client_gets_429(client, letter):
+    upload(client, letter)
+    assert client.post("/process", json={"format": "csv"}).status_code == 202
+
+    response = client.post("/process", json={"format": "csv"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.get_json()["error"] == "You already have a job in progress"
+
+
+def test_full_backlog_gets_429_until_a_job_finishes(client, letter, monkeypatch):
+    monkeypatch.setattr(app, "MAX_ACTIVE_JOBS", 1)
+    upload(client, letter)
+    assert client.post("/process", json={"format": "csv"}).status_code == 202
+
+    other = app.app.test_client()
+    upload(other, letter)
+    response = other.post("/process", json={"format": "csv"})
+    assert response.status_code == 429
+    body = response.get_json()
+    assert body["error"] == "The server is busy processing other batches" and body["position"] == 2
+    assert response.headers["Retry-After"] == str(body["retry_after"])
+
+    app._execute_job(app.state_store.claim_job())
+    assert other.post("/process", json={"format": "csv"}).status_code == 202
+
+
+def test_archive_upload_is_admitted_like_a_job(client, letter, monkeypatch):
+    monkeypatch.setattr(app, "MAX_ACTIVE_JOBS", 0)
+    response = client.post("/upload", data={"files": (io.BytesIO(zipped(letter)), "letters.zip")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 429
+    assert app.blob_store.list_batches() == []  # the new batch is not left behind
+
+    # Plain TXT files are only stored, so they need no slot
+    upload(client, letter)
+
+
+def test_api_parses_archives_and_releases_its_slot(client, letter, stores):
+    state, _ = stores
+    response = client.post("/api/v1/parse?filename=letters.zip&format=ndjson", data=zipped(letter, 3))
+    assert response.status_code == 200
+    entries = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [entry["NO"] for entry in entries] == [1, 2, 3]
+    assert all("error" not in entry for entry in entries)
+    response.close()  # what the server does after sending the body
+    assert app.SQLiteStateStore._active_jobs(state._db.connect()) == []
+
+
+def test_api_gets_429_when_the_backlog_is_full(client, letter, monkeypatch):
+    monkeypatch.setattr(app, "MAX_ACTIVE_JOBS", 0)
+    response = client.post("/api/v1/parse?filename=a.txt", data=letter())
+    assert response.status_code == 429 and "Retry-After" in response.headers
@@ -0,0 +1,72 @@
+"""Archive uploads: members, limits and unreadable archives."""
+import io
+import tarfile
+import zipfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import app
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, raw in members.items():
+            z.writestr(name, raw)
+    return buffer.getvalue()
+
+
+def make_tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as t:
+        for name, raw in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(raw)
+            t.addfile(info, io.BytesIO(raw))
+    return buffer.getvalue()
+
+
+def members_of(data, filename):
+    return list(app.iter_archive(FileStorage(io.BytesIO(data), filename)))
+
+
+@pytest.mark.parametrize("make, filename", [(make_zip, "letters.zip"), (make_tar, "letters.tar.gz")])
+def test_members_are_yielded_with_their_problems(make, filename, letter, monkeypatch):
+    monkeypatch.setattr(app, "MAX_FILE_SIZE", 4096)
+    raw = letter()
+    members = members_of(make({"2025/a.txt": raw, "notes.pdf": b"%PDF", "big.txt": b"x" * 5000}), filename)
+    assert members == [("a.txt", raw, None), ("notes.pdf", None, "invalid type"), ("big.txt", None, "too large")]
+
+
+@pytest.mark.parametrize("make, filename", [(make_zip, "letters.zip"), (make_tar, "letters.tgz")])
+def test_member_count_and_total_size_are_limited(make, filename, monkeypatch):
+    data = make({f"{i}.txt": b"x" * 100 for i in range(3)})
+    monkeypatch.setattr(app, "MAX_ARCHIVE_MEMBERS", 2)
+    with pytest.raises(app.ArchiveError, match="more than 2 members"):
+        members_of(data, filename)
+
+    monkeypatch.setattr(app, "MAX_ARCHIVE_MEMBERS", 5000)
+    monkeypatch.setattr(app, "MAX_ARCHIVE_BYTES", 250)
+    with pytest.raises(app.ArchiveError, match="more than 250 bytes"):
+        members_of(data, filename)
+
+
+def test_zip_member_expanding_too_far_is_refused():
+    with pytest.raises(app.ArchiveError, match="expands more than"):
+        members_of(make_zip({"bomb.txt": b"0" * 1024 * 1024}), "bomb.zip")
+
+
+def test_unreadable_archive_is_an_archive_error():
+    with pytest.raises(app.ArchiveError, match="unreadable"):
+        members_of(b"not a zip", "letters.zip")
+
+
+def test_upload_over_a_limit_keeps_nothing(stores, letter, monkeypatch):
+    _, blobs = stores
+    monkeypatch.setattr(app, "MAX_ARCHIVE_MEMBERS", 2)
+    data = make_zip({f"JFCS2-1_FIFIP_PKKF0{i + 1}072025.txt": letter() for i in range(3)})
+    response = app.app.test_client().post("/upload", data={"files": (io.BytesIO(data), "letters.zip")},
+                                          content_type="multipart/form-data")
+    assert response.status_code == 400 and "more than 2 members" in response.get_json()["error"]
+    assert blobs.list_batches() == []
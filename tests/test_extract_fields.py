@@ -0,0 +1,96 @@
+"""Regression tests for the lettered-point windows used by extract_fields."""
+import time
+
+import pytest
+
+from app import CATEGORY_RULES, extract_fields, sum_category
+
+DENDA = dict(CATEGORY_RULES)["Pembayaran Denda"]
+RECOVERY = dict(CATEGORY_RULES)["Pembayaran Recovery"]
+
+
+def letter(*points, subject="Pemberitahuan Dana Pembayaran"):
+    return "\r\n".join([
+        "Kepada Yth. Bank JF (JFCS2)",
+        f"Perihal : {subject}",
+        "Bersama ini kami sampaikan transfer dana pembayaran sejumlah Rp. 1.500.000",
+        "dengan rincian sebagai berikut:",
+        *points,
+        "Demikian kami sampaikan.",
+    ])
+
+
+def test_keywords_in_the_header_are_skipped():
+    text = letter(
+        "a) Pembayaran angsuran sebesar Rp. 1.000.000 untuk 10 Konsumen",
+        "b) Pembayaran denda sebesar Rp. 200.000 untuk 4 Konsumen",
+        "c) Pembayaran recovery sebesar Rp. 300.000 untuk 6 Konsumen",
+        subject="Pembayaran Denda dan Pembayaran Recovery",
+    )
+    fields = extract_fields(text)
+    assert (fields["Pembayaran Denda Jumlah"], fields["Pembayaran Denda Acc"]) == (200_000, 4)
+    assert (fields["Pembayaran Recovery Jumlah"], fields["Pembayaran Recovery Acc"]) == (300_000, 6)
+    assert fields["Dana Pembayaran Jumlah"] == 1_500_000
+    assert sum_category(DENDA, text) == (200_000, 4)
+    assert sum_category(RECOVERY, text) == (300_000, 6)
+
+
+def test_point_without_count_does_not_borrow_the_next_one():
+    text = letter(
+        "a) Pembayaran angsuran sebesar Rp. 1.000.000 untuk 10 Konsumen",
+        "b) Pembayaran denda sebesar Rp. 200.000",
+        "c) Pembayaran recovery sebesar Rp. 300.000 untuk 6 Konsumen",
+    )
+    fields = extract_fields(text)
+    assert (fields["Pembayaran Denda Jumlah"], fields["Pembayaran Denda Acc"]) == (0, 0)
+    assert (fields["Pembayaran Recovery Jumlah"], fields["Pembayaran Recovery Acc"]) == (300_000, 6)
+
+
+def test_later_point_is_used_when_the_first_window_has_no_tail():
+    text = letter(
+        "a) Pembayaran angsuran sebesar Rp. 1.000.000 untuk 10 Konsumen",
+        "b) Pembayaran denda: lihat poin d",
+        "c) Pembayaran recovery sebesar Rp. 300.000 untuk 6 Konsumen",
+        "d) Pembayaran denda sebesar Rp. 200.000 untuk 4 Konsumen",
+    )
+    fields = extract_fields(text)
+    assert (fields["Pembayaran Denda Jumlah"], fields["Pembayaran Denda Acc"]) == (200_000, 4)
+    assert sum_category(DENDA, text) == (200_000, 4)
+
+
+def test_letter_without_points_reads_the_header_window():
+    text = "Pembayaran denda sebesar Rp. 75.000 untuk 3 Konsumen"
+    assert extract_fields(text)["Pembayaran Denda Jumlah"] == 75_000
+    assert sum_category(DENDA, text) == (75_000, 3)
+
+
+def test_zero_amount_forces_zero_count():
+    text = letter(
+        "a) Pembayaran angsuran sebesar Rp. 1.000.000 untuk 10 Konsumen",
+        "b) Pembayaran denda sebesar Rp. 0,- untuk 7 Konsumen",
+    )
+    fields = extract_fields(text)
+    assert (fields["Pembayaran Denda Jumlah"], fields["Pembayaran Denda Acc"]) == (0, 0)
+
+
+def _best_time(fn, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.parametrize("prefix, unit", [
+    ("", "Pembayaran denda sebesar Rp. 1.000 untuk "),
+    ("a) ", "Pembayaran denda sebesar Rp. 1.000 untuk "),
+    ("", "b) Pembayaran denda sebesar Rp. 1.000 untuk "),
+])
+def test_repeated_keywords_without_count_scale_linearly(prefix, unit):
+    # Each failed hit used to rescan its whole window: 8x the text cost 64x the time
+    small, large = prefix + unit * 500, prefix + unit * 4000
+    for fn in (extract_fields, lambda text: sum_category(DENDA, text)):
+        assert fn(large) is not None
+        ratio = _best_time(fn, large) / max(_best_time(fn, small), 1e-4)
+        assert ratio < 24
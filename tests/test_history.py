@@ -0,0 +1,72 @@
+"""HistoryStore range queries and the /history endpoints."""
+import pytest
+
+import app
+
+
+def entry(filename, sofcode="JFCS2", amount=1000):
+    data = {col: 0 for col in app.AMOUNT_COLUMNS}
+    data.update({"filename": filename, "BANK JF/SOFCODE": sofcode, "sha256": filename,
+                 "Dana Pembayaran Jumlah": amount})
+    return data
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    store = app.HistoryStore(str(tmp_path / "history.sqlite3"))
+    store.record([
+        entry("JFCS2-1_FIFIP_PKKF31122024.txt", amount=1),
+        entry("JFCS2-1_FIFIP_PKKF05012025.txt", amount=10),
+        entry("JFCS2-1_FIFIP_PKKF20012025.txt", amount=100),
+        entry("JASA-1_FIFIP_PKKF03022025.txt", sofcode="JASA", amount=1000),
+    ])
+    monkeypatch.setattr(app, "history_store", store)
+    return store
+
+
+def dates(rows):
+    return [row["statement_date"] for row in rows]
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("2025-01", "2025-01", ["2025-01-05", "2025-01-20"]),
+    ("2025-1", "2025-1", ["2025-01-05", "2025-01-20"]),
+    ("2025-01-5", "2025-2-3", ["2025-01-05", "2025-01-20", "2025-02-03"]),
+    ("2025", None, ["2025-01-05", "2025-01-20", "2025-02-03"]),
+    (None, "2024", ["2024-12-31"]),
+])
+def test_rows_in_range(history, start, end, expected):
+    assert dates(history.rows(start, end)) == expected
+
+
+def test_invalid_bound_is_rejected(history):
+    with pytest.raises(ValueError):
+        history.rows("2025-13")
+
+
+def test_letter_sent_again_replaces_the_earlier_row(history):
+    history.record([entry("JFCS2-1_FIFIP_PKKF05012025.txt", amount=7)])
+    rows = history.rows("2025-01-05", "2025-01-05")
+    assert [row["Dana Pembayaran Jumlah"] for row in rows] == [7]
+
+
+def test_aggregate_per_month_and_sofcode(history):
+    months = history.aggregate(period="month")
+    assert [(m["period"], m["files"], m["Dana Pembayaran Jumlah"]) for m in months] == [
+        ("2024-12", 1, 1), ("2025-01", 2, 110), ("2025-02", 1, 1000)]
+    per_bank = history.aggregate("2025", period="year", by_sofcode=True)
+    assert [(m["BANK JF/SOFCODE"], m["files"]) for m in per_bank] == [("JASA", 1), ("JFCS2", 2)]
+
+
+def test_history_endpoints(history, monkeypatch):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    client = app.app.test_client()
+    assert client.get("/history/rows").status_code == 403
+    admin = {"X-Admin-Token": "secret"}
+
+    response = client.get("/history/rows?from=2025-1&to=2025-1&sofcode=JFCS2", headers=admin)
+    assert response.status_code == 200
+    assert dates(response.get_json()["rows"]) == ["2025-01-05", "2025-01-20"]
+    assert client.get("/history/rows?from=2025-13", headers=admin).status_code == 400
+    response = client.get("/history/aggregate?period=year&group=sofcode", headers=admin)
+    assert [row["period"] for row in response.get_json()["rows"]] == ["2024", "2025", "2025"]
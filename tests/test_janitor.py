@@ -0,0 +1,62 @@
+"""Upload janitor: TTL, quota eviction, busy batches and retired leftovers."""
+import os
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def batch(stores):
+    """Make a batch of `size` bytes last touched `age` seconds ago."""
+    _, blobs = stores
+
+    def make(size=1000, age=0):
+        batch_id = blobs.new_batch()
+        path = blobs.batch_path(batch_id)
+        with open(os.path.join(path, "letter.txt"), "wb") as f:
+            f.write(b"x" * size)
+        stamp = time.time() - age
+        for name in (os.path.join(path, "letter.txt"), path):
+            os.utime(name, (stamp, stamp))
+        return batch_id
+    return make
+
+
+def test_idle_batches_expire(stores, batch, monkeypatch):
+    _, blobs = stores
+    monkeypatch.setattr(app, "UPLOAD_TTL_SECONDS", 3600)
+    old, fresh = batch(age=7200), batch(age=60)
+    assert app.sweep_uploads() == (1, 1000)
+    assert blobs.list_batches() == [fresh]
+    assert not os.path.exists(os.path.join(blobs.root, f".trash-{old}"))
+
+
+def test_quota_evicts_oldest_first_outside_the_grace_period(stores, batch, monkeypatch):
+    _, blobs = stores
+    monkeypatch.setattr(app, "UPLOAD_TTL_SECONDS", 0)
+    monkeypatch.setattr(app, "UPLOAD_QUOTA_BYTES", 2500)
+    monkeypatch.setattr(app, "UPLOAD_GRACE_SECONDS", 600)
+    oldest, older, recent = batch(age=5000), batch(age=4000), batch(age=10)
+    batch(age=5)
+    assert app.sweep_uploads() == (2, 2000)
+    assert oldest not in blobs.list_batches() and older not in blobs.list_batches()
+    assert recent in blobs.list_batches()
+
+
+def test_batches_with_an_active_job_are_kept(stores, batch, monkeypatch):
+    _, blobs = stores
+    monkeypatch.setattr(app, "UPLOAD_TTL_SECONDS", 3600)
+    busy = batch(age=7200)
+    app.submit_job(busy, "csv")
+    assert app.sweep_uploads() == (0, 0)
+    assert blobs.list_batches() == [busy]
+
+
+def test_retired_batches_left_behind_are_purged(stores, batch):
+    _, blobs = stores
+    assert blobs.retire_batch(batch())
+    assert blobs.list_batches() == []
+    assert app.sweep_uploads() == (0, 0)
+    assert os.listdir(blobs.root) == []
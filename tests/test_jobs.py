@@ -0,0 +1,80 @@
+"""Background jobs: claiming, heartbeat and staleness, profiling."""
+import os
+import time
+
+import app
+
+
+def batch_with_letters(blobs, letter, count=3):
+    batch_id = blobs.new_batch()
+    for i in range(count):
+        with open(os.path.join(blobs.batch_path(batch_id), f"JFCS2-1_FIFIP_PKKF0{i + 1}072025.txt"), "wb") as f:
+            f.write(letter())
+    return batch_id
+
+
+def run_next_job():
+    job = app.state_store.claim_job()
+    app._execute_job(job)
+    return app.get_job(job["job_id"])
+
+
+def test_profiled_job_writes_a_profile(stores, letter):
+    _, blobs = stores
+    job_id = app.submit_job(batch_with_letters(blobs, letter), "csv", profile=True)
+    job = run_next_job()
+    assert job["job_id"] == job_id and job["status"] == "done"
+    assert job["profile_name"] and os.path.exists(os.path.join(app.PROFILE_FOLDER, job["profile_name"]))
+
+
+def test_second_profiled_job_runs_unprofiled(stores, letter):
+    _, blobs = stores
+    app.submit_job(batch_with_letters(blobs, letter), "csv", profile=True)
+    with app._profile_lock:  # another job of this process is being profiled
+        job = run_next_job()
+    assert job["status"] == "done"
+    assert job["profile_name"] is None
+    assert not app._profile_lock.locked()
+
+
+def test_jobs_are_claimed_oldest_first_and_once(stores, letter):
+    state, blobs = stores
+    first = app.submit_job(batch_with_letters(blobs, letter), "csv")
+    second = app.submit_job(batch_with_letters(blobs, letter), "csv")
+    assert state.queue_position(second) == 2
+
+    # Another worker process sees the same queue through the same database
+    other = app.SQLiteStateStore(state.db_path)
+    assert other.claim_job()["job_id"] == first
+    assert state.queue_position(second) == 1
+    assert state.claim_job()["job_id"] == second
+    assert state.claim_job() is None and other.claim_job() is None
+
+
+def test_queued_job_never_goes_stale(stores, letter, monkeypatch):
+    _, blobs = stores
+    job_id = app.submit_job(batch_with_letters(blobs, letter), "csv")
+    monkeypatch.setattr(app, "JOB_STALE_SECONDS", -1)
+    assert app.get_job(job_id)["status"] == "queued"
+
+
+def test_running_job_without_heartbeat_is_reported_interrupted(stores, letter, monkeypatch):
+    state, blobs = stores
+    job_id = app.submit_job(batch_with_letters(blobs, letter), "csv")
+    state.claim_job()
+    assert app.get_job(job_id)["status"] == "running"
+    monkeypatch.setattr(app, "JOB_STALE_SECONDS", -1)
+    job = app.get_job(job_id)
+    assert job["status"] == "error" and "interrupted" in job["message"]
+    # It no longer holds a backlog slot either
+    assert app.SQLiteStateStore._active_jobs(state._db.connect()) == []
+
+
+def test_heartbeat_touches_the_job_record(stores, letter, monkeypatch):
+    state, blobs = stores
+    job_id = app.submit_job(batch_with_letters(blobs, letter), "csv")
+    before = state.get_job(job_id)["updated_at"]
+    monkeypatch.setattr(app, "JOB_HEARTBEAT_SECONDS", 0.01)
+    with app.job_heartbeat(job_id):
+        time.sleep(0.1)
+    assert state.get_job(job_id)["updated_at"] > before
@@ -0,0 +1,28 @@
+import os
+from array import array
+
+import app
+
+DEAD_PID = 999999999
+
+
+def write_values(metrics, pid, values):
+    with open(os.path.join(metrics.directory, f"{metrics._layout()}_{pid}.db"), 'wb') as f:
+        f.write(array('d', values).tobytes())
+
+
+def test_dead_process_files_are_folded(tmp_path):
+    metrics = app.MetricFiles(str(tmp_path))
+    metrics.allocate(2)
+    metrics.allocate(1, reset=True)
+    metrics.add(0, 1)
+    write_values(metrics, DEAD_PID, [2, 3, 7])
+    write_values(metrics, DEAD_PID - 1, [4, 5, 7])
+
+    files = metrics.read()
+    assert sorted((alive, list(values)) for alive, values in files) == [(False, [6, 8, 0]), (True, [1, 0, 0])]
+    assert sorted(os.listdir(tmp_path)) == [f"{metrics._layout()}_{os.getpid()}.db", f"{metrics._layout()}_dead.db"]
+
+    write_values(metrics, DEAD_PID, [1, 1, 1])
+    assert [list(values) for alive, values in metrics.read() if not alive] == [[7, 9, 0]]
+    assert [list(values) for alive, values in metrics.read() if not alive] == [[7, 9, 0]]
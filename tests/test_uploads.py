@@ -0,0 +1,56 @@
+"""Chunked uploads: resuming, offset checks, durability of claimed chunks."""
+import hashlib
+
+import pytest
+
+import app
+
+FILENAME = "JFCS2-1_FIFIP_PKKF01072025.txt"
+
+
+@pytest.fixture
+def client(stores):
+    return app.app.test_client()
+
+
+def start(client, data, **options):
+    response = client.post("/uploads", json={"filename": FILENAME, "size": len(data), **options})
+    assert response.status_code == 201
+    return response.get_json()["upload_id"]
+
+
+def put(client, upload_id, offset, chunk):
+    return client.put(f"/uploads/{upload_id}?offset={offset}", data=chunk)
+
+
+def test_chunks_resume_from_the_reported_offset(client, letter):
+    data = letter()
+    upload_id = start(client, data, sha256=hashlib.sha256(data).hexdigest())
+    half = len(data) // 2
+    assert put(client, upload_id, 0, data[:half]).get_json() == {"offset": half}
+
+    # A repeated or skipped chunk is refused with the offset to continue from
+    for offset in (0, half + 1):
+        response = put(client, upload_id, offset, data[offset:offset + 10])
+        assert response.status_code == 409 and response.get_json()["offset"] == half
+    assert client.get(f"/uploads/{upload_id}").get_json()["offset"] == half
+
+    assert put(client, upload_id, half, data[half:]).get_json() == {"offset": len(data)}
+    response = client.post(f"/uploads/{upload_id}/finalize")
+    assert response.status_code == 200 and response.get_json()["uploaded"] == 1
+
+
+def test_failed_chunk_write_does_not_advance_the_offset(client, letter, monkeypatch):
+    data = letter()
+    upload_id = start(client, data)
+
+    def fail(fd):
+        raise OSError("disk full")
+    with monkeypatch.context() as m:
+        m.setattr(app.os, "fsync", fail)
+        assert put(client, upload_id, 0, data).status_code == 500
+    assert client.get(f"/uploads/{upload_id}").get_json()["offset"] == 0
+    assert client.post(f"/uploads/{upload_id}/finalize").status_code == 409
+
+    assert put(client, upload_id, 0, data).get_json() == {"offset": len(data)}
+    assert client.post(f"/uploads/{upload_id}/finalize").status_code == 200